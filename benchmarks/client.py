@@ -0,0 +1,106 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+import h11
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class HttpClient:
+    """
+    Minimal keep-alive HTTP/1.1 client, one connection per simulated user.
+    Built on h11 (already installed with uvicorn), so that benchmarks need no extra dependencies.
+    """
+    base_url: str
+    cookies: dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        url = urlsplit(self.base_url)
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 80
+        self.path_prefix = url.path.rstrip("/")
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._connection: h11.Connection | None = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._connection = h11.Connection(h11.CLIENT)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: dict[str, Any] | None = None,
+        json_body: Any = None,
+        headers: dict[str, str] | None = None
+    ) -> HttpResponse:
+        if self._connection is None or self._connection.our_state is not h11.IDLE:
+            await self.close()
+            await self._connect()
+
+        target = self.path_prefix + path
+        if params:
+            target += "?" + urlencode(params, doseq=True)
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+
+        request_headers = [("Host", self.host), ("Content-Length", str(len(body)))]
+        if json_body is not None:
+            request_headers.append(("Content-Type", "application/json"))
+        if self.cookies:
+            request_headers.append(("Cookie", "; ".join(f"{name}={value}" for name, value in self.cookies.items())))
+        request_headers.extend((headers or {}).items())
+
+        self._writer.write(self._connection.send(h11.Request(method=method, target=target, headers=request_headers)))
+        self._writer.write(self._connection.send(h11.Data(data=body)))
+        self._writer.write(self._connection.send(h11.EndOfMessage()))
+        await self._writer.drain()
+
+        response = None
+        response_body = bytearray()
+        while True:
+            event = self._connection.next_event()
+            if event is h11.NEED_DATA:
+                self._connection.receive_data(await self._reader.read(65536))
+            elif isinstance(event, h11.Response):
+                response = event
+            elif isinstance(event, h11.Data):
+                response_body += event.data
+            elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+                break
+
+        response_headers = {}
+        for name, value in response.headers:
+            name, value = name.decode().lower(), value.decode()
+            if name == "set-cookie":
+                cookie_name, _, cookie_value = value.split(";", 1)[0].partition("=")
+                if cookie_value:
+                    self.cookies[cookie_name] = cookie_value
+                else:
+                    self.cookies.pop(cookie_name, None)
+            response_headers[name] = value
+
+        if self._connection.our_state is h11.DONE and self._connection.their_state is h11.DONE:
+            self._connection.start_next_cycle()
+        else:
+            await self.close()
+            self._connection = None
+
+        return HttpResponse(response.status_code, response_headers, bytes(response_body))
@@ -0,0 +1,66 @@
+import json
+import math
+from typing import Any
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Returns the nearest-rank `q`-th percentile of the given sorted values."""
+    if not sorted_values:
+        return math.nan
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], errors_n: int, elapsed: float) -> dict[str, Any]:
+    """Returns throughput and latency percentiles (in milliseconds) of a single scenario run."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors_n,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else math.nan
+    }
+
+
+def save_report(path: str, metadata: dict[str, Any], scenarios: dict[str, dict[str, Any]]):
+    with open(path, "w") as f:
+        json.dump({"metadata": metadata, "scenarios": scenarios}, f, indent=2)
+
+
+def load_report(path: str) -> dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _format_delta(value: float, baseline_value: float | None) -> str:
+    if baseline_value is None or not baseline_value or math.isnan(baseline_value) or math.isnan(value):
+        return ""
+    return f" ({(value - baseline_value) / baseline_value * 100:+.0f}%)"
+
+
+def format_report(scenarios: dict[str, dict[str, Any]], baseline: dict[str, Any] | None = None) -> str:
+    """Returns a table of the scenarios' results with relative changes against the baseline report, if given."""
+    columns = ("requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    baseline_scenarios = baseline["scenarios"] if baseline is not None else {}
+
+    rows = [("scenario", *columns)]
+    for name, summary in scenarios.items():
+        baseline_summary = baseline_scenarios.get(name, {})
+        rows.append((
+            name,
+            str(summary["requests"]),
+            str(summary["errors"]),
+            *(
+                f"{summary[column]:.1f}{_format_delta(summary[column], baseline_summary.get(column))}"
+                for column in columns[2:]
+            )
+        ))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows
+    )
@@ -0,0 +1,135 @@
+"""
+Runs the benchmark scenarios against a running app under concurrency and reports
+throughput and p50/p95/p99 latencies per scenario, optionally compared to a previous run.
+
+Run with `python -m benchmarks.run --help` at root level.
+"""
+import argparse
+import asyncio
+import platform
+import random
+import time
+from datetime import datetime, timezone
+import h11
+from benchmarks.client import HttpClient
+from benchmarks.report import format_report, load_report, save_report, summarize
+from benchmarks.scenarios import SCENARIOS, Scenario, ScenarioContext, login
+from benchmarks.seed import DEFAULT_PASSWORD
+from clogged.admin.config import settings as admin_settings
+
+
+def select_scenarios(names: str) -> list[Scenario]:
+    """Returns scenarios by the given comma-separated names or router prefixes, e.g. `post,auth.login`."""
+    selected = []
+    for name in filter(None, map(str.strip, names.split(","))):
+        matched = [
+            scenario for scenario_name, scenario in SCENARIOS.items()
+            if scenario_name == name or scenario_name.startswith(f"{name}.")
+        ]
+        if not matched:
+            raise SystemExit(f"Unknown scenario {name!r}, known scenarios: {', '.join(SCENARIOS)}")
+        selected.extend(scenario for scenario in matched if scenario not in selected)
+    return selected
+
+
+async def run_users(
+    scenarios: list[Scenario],
+    ctx: ScenarioContext,
+    args: argparse.Namespace,
+    duration: float,
+    user_seed: int
+) -> dict[str, tuple[list[float], int]]:
+    """Runs `args.concurrency` simulated users picking weighted scenarios for `duration` seconds."""
+    results = {scenario.name: ([], 0) for scenario in scenarios}
+    weights = [scenario.weight for scenario in scenarios]
+    deadline = time.perf_counter() + duration
+
+    async def run_user(user_index: int):
+        rng = random.Random(user_seed * 100_003 + user_index)
+        client = HttpClient(args.base_url)
+        try:
+            if any(scenario.requires_auth for scenario in scenarios):
+                # Logging in is a setup step here, it's measured by its own scenario.
+                await login(client, ctx, rng)
+            while time.perf_counter() < deadline:
+                scenario = rng.choices(scenarios, weights=weights)[0]
+                started_at = time.perf_counter()
+                try:
+                    response = await scenario.run(client, ctx, rng)
+                    failed = response.status >= 400
+                except (OSError, h11.ProtocolError):
+                    failed = True
+                latencies, errors_n = results[scenario.name]
+                latencies.append(time.perf_counter() - started_at)
+                results[scenario.name] = (latencies, errors_n + failed)
+        finally:
+            await client.close()
+
+    await asyncio.gather(*(run_user(i) for i in range(args.concurrency)))
+    return results
+
+
+async def run(args: argparse.Namespace):
+    scenarios = select_scenarios(args.scenarios)
+    ctx = ScenarioContext(
+        posters=args.posters,
+        posts=args.posts,
+        tags=args.tags,
+        password=args.password,
+        admin_api_key=args.admin_api_key
+    )
+    # Scenarios either run one by one to be comparable between runs, or all at once as a realistic mix.
+    groups = [[scenario] for scenario in scenarios] if args.mode == "each" else [scenarios]
+
+    summaries = {}
+    for group_index, group in enumerate(groups):
+        if args.warmup > 0:
+            await run_users(group, ctx, args, args.warmup, args.seed + group_index + 1_000)
+        started_at = time.perf_counter()
+        results = await run_users(group, ctx, args, args.duration, args.seed + group_index)
+        elapsed = time.perf_counter() - started_at
+        for name, (latencies, errors_n) in results.items():
+            summaries[name] = summarize(latencies, errors_n, elapsed)
+            print(f"Finished {name}: {summaries[name]['requests']} requests", flush=True)
+
+    baseline = load_report(args.compare) if args.compare else None
+    print(format_report(summaries, baseline))
+
+    if args.output:
+        metadata = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "seed": args.seed,
+            "python": platform.python_version()
+        }
+        save_report(args.output, metadata, summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS),
+        help="comma-separated scenario names or router prefixes (post, auth, poster, admin), defaults to all"
+    )
+    parser.add_argument("--mode", choices=("each", "mixed"), default="each")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of simulated users")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per scenario run")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each scenario run")
+    parser.add_argument("--seed", type=int, default=42)
+    # Should match the parameters `benchmarks.seed` was run with.
+    parser.add_argument("--posters", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--admin-api-key", default=admin_settings.CLOGGED_ADMIN_API_KEY)
+    parser.add_argument("--output", help="path to save the JSON report to")
+    parser.add_argument("--compare", help="path of a previous JSON report to compare against")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
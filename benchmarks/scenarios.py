@@ -0,0 +1,125 @@
+"""
+Scripted scenarios for each router.
+
+Every scenario is a single user action, possibly consisting of several requests,
+and is expected to succeed against a database filled by `benchmarks.seed`.
+"""
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from benchmarks.client import HttpClient, HttpResponse
+from benchmarks.seed import WORDS, generate_text, poster_username, tag_name
+
+
+@dataclass
+class ScenarioContext:
+    """Seeded dataset parameters and credentials shared by all simulated users."""
+    posters: int
+    posts: int
+    tags: int
+    password: str
+    admin_api_key: str
+
+
+@dataclass
+class Scenario:
+    name: str
+    run: Callable[[HttpClient, ScenarioContext, random.Random], Awaitable[HttpResponse]]
+    # Relative frequency of the scenario in a mixed workload.
+    weight: int = 1
+    requires_auth: bool = False
+
+
+async def login(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request(
+        "POST", "/auth/login",
+        json_body={"username": poster_username(rng.randint(1, ctx.posters)), "password": ctx.password}
+    )
+
+
+async def check_auth(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", "/auth/check")
+
+
+async def get_post(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", f"/post/{rng.randint(1, ctx.posts)}")
+
+
+async def get_latest_posts(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", "/post/latest/", params={"limit": 20})
+
+
+async def get_latest_posts_by_tag(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request(
+        "GET", "/post/latest/",
+        params={"tag": tag_name(rng.randint(1, ctx.tags)), "limit": 20}
+    )
+
+
+async def get_latest_posts_pages(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    """Follows the feed for a few pages, like an infinitely scrolling client does."""
+    response = await client.request("GET", "/post/latest/", params={"limit": 20})
+    for _ in range(4):
+        cursor = response.headers.get("x-next-cursor")
+        if response.status != 200 or cursor is None:
+            break
+        response = await client.request("GET", "/post/latest/", params={"limit": 20, "cursor": cursor})
+    return response
+
+
+async def search_posts(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", "/post/search/", params={"q": " ".join(rng.sample(WORDS, 2)), "limit": 20})
+
+
+async def get_tags(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", "/post/tags/")
+
+
+async def create_post(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request(
+        "POST", "/post/",
+        json_body={
+            "title": generate_text(rng, 5),
+            "text": generate_text(rng, rng.randint(20, 300)),
+            "tags": [tag_name(rng.randint(1, ctx.tags)) for _ in range(rng.randint(0, 3))]
+        }
+    )
+
+
+async def get_posters(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", "/poster/posters")
+
+
+async def get_poster(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    return await client.request("GET", f"/poster/{rng.randint(1, ctx.posters)}")
+
+
+async def create_and_delete_poster(client: HttpClient, ctx: ScenarioContext, rng: random.Random) -> HttpResponse:
+    headers = {"X-Api-Key": ctx.admin_api_key}
+    response = await client.request(
+        "POST", "/admin/poster",
+        json_body={"username": f"tmp{rng.getrandbits(40):x}"[:16], "password": ctx.password},
+        headers=headers
+    )
+    if response.status != 201:
+        return response
+    return await client.request("DELETE", f"/admin/poster/{response.json()['id']}", headers=headers)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("post.get_post", get_post, weight=20),
+        Scenario("post.latest", get_latest_posts, weight=10),
+        Scenario("post.latest_by_tag", get_latest_posts_by_tag, weight=5),
+        Scenario("post.latest_pages", get_latest_posts_pages, weight=2),
+        Scenario("post.search", search_posts, weight=3),
+        Scenario("post.tags", get_tags, weight=2),
+        Scenario("post.create", create_post, weight=1, requires_auth=True),
+        Scenario("auth.login", login, weight=1),
+        Scenario("auth.check", check_auth, weight=3, requires_auth=True),
+        Scenario("poster.posters", get_posters, weight=2),
+        Scenario("poster.get_poster", get_poster, weight=5),
+        Scenario("admin.create_delete_poster", create_and_delete_poster, weight=1),
+    )
+}
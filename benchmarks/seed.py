@@ -0,0 +1,168 @@
+"""
+Fills the configured Postgres database with a reproducible synthetic dataset using COPY
+When replacing existing data with `--truncate`, also flushes the configured Redis database 
+and makes running workers rebuild their in-memory state, so that no data cached from the previous dataset is served.
+
+Run with `python -m benchmarks.seed --help` at root level.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import asyncpg
+from argon2 import PasswordHasher
+from redis.asyncio import Redis
+from clogged.config import settings as app_settings
+from clogged.database import close_db, init_db
+from clogged.redis import publish_resync
+
+
+# Every seeded poster shares this password, so that scenarios can log in as any of them.
+DEFAULT_PASSWORD = "benchmark"
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+    "et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip "
+    "postgres redis python async cache index query latency throughput feed search tag blog"
+).split()
+
+
+def poster_username(poster_id: int) -> str:
+    return f"bench{poster_id}"
+
+
+def tag_name(tag_id: int) -> str:
+    return f"tag{tag_id}"
+
+
+def generate_text(rng: random.Random, words_n: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words_n))
+
+
+async def copy_in_batches(conn: asyncpg.Connection, table: str, columns: list[str], records, batch_size: int) -> int:
+    """Copies the given records iterable into the table in batches and returns the number of copied records."""
+    copied_n = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            await conn.copy_records_to_table(table, records=batch, columns=columns)
+            copied_n += len(batch)
+            batch = []
+    if batch:
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        copied_n += len(batch)
+    return copied_n
+
+
+async def reset_app_cache():
+    """
+    Flushes the app's Redis database and makes running workers rebuild their in-memory state,
+    e.g. the tag registry, through the app's resync channel.
+    """
+    cache = Redis.from_url(app_settings.REDIS_DSN.unicode_string())
+    try:
+        await cache.flushdb()
+        await publish_resync(cache)
+    finally:
+        await cache.aclose()
+
+
+async def seed(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    # Tables and indexes are created the same way the app does it on startup.
+    await init_db()
+    await close_db()
+
+    conn = await asyncpg.connect(app_settings.DATABASE_DSN.unicode_string().replace("+asyncpg", ""))
+    try:
+        if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM posters) OR EXISTS (SELECT 1 FROM post_tags)"):
+            if not args.truncate:
+                raise SystemExit("Database is not empty, pass --truncate to replace its contents")
+            await conn.execute("TRUNCATE tagged_posts, posts, post_tags, posters RESTART IDENTITY CASCADE")
+
+        started_at = time.perf_counter()
+        # Hashing is slow on purpose, so a single hash is shared by all posters.
+        credentials = PasswordHasher().hash(args.password)
+        await copy_in_batches(
+            conn, "posters", ["id", "username", "credentials"],
+            ((poster_id, poster_username(poster_id), credentials) for poster_id in range(1, args.posters + 1)),
+            args.batch_size
+        )
+
+        now = datetime.now(timezone.utc)
+        await copy_in_batches(
+            conn, "posts", ["id", "poster_id", "title", "created_at", "text"],
+            (
+                (
+                    post_id,
+                    rng.randint(1, args.posters),
+                    generate_text(rng, rng.randint(3, 10)),
+                    # Spread posts over the last year, with ids growing with creation time.
+                    now - timedelta(seconds=(args.posts - post_id) * 365 * 24 * 3600 // args.posts),
+                    generate_text(rng, rng.randint(20, args.max_text_words))
+                )
+                for post_id in range(1, args.posts + 1)
+            ),
+            args.batch_size
+        )
+
+        tag_posts_n = Counter()
+        def tagged_posts():
+            # Tag popularity follows a rough power law, like real tags do.
+            tag_weights = [1 / tag_id for tag_id in range(1, args.tags + 1)]
+            for post_id in range(1, args.posts + 1):
+                tags_n = rng.randint(0, min(args.max_tags_per_post, args.tags))
+                for tag_id in set(rng.choices(range(1, args.tags + 1), weights=tag_weights, k=tags_n)):
+                    tag_posts_n[tag_id] += 1
+                    yield post_id, tag_id
+
+        await copy_in_batches(
+            conn, "post_tags", ["id", "name", "posts_n"],
+            ((tag_id, tag_name(tag_id), 0) for tag_id in range(1, args.tags + 1)),
+            args.batch_size
+        )
+        tagged_posts_n = await copy_in_batches(
+            conn, "tagged_posts", ["post_id", "tag_id"], tagged_posts(), args.batch_size
+        )
+        await conn.executemany(
+            "UPDATE post_tags SET posts_n = $2, last_used_at = now() WHERE id = $1",
+            list(tag_posts_n.items())
+        )
+
+        # Explicit ids were copied, so sequences have to catch up for the app's own inserts.
+        for table in ("posters", "posts", "post_tags"):
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+            )
+        await conn.execute("ANALYZE")
+        if args.truncate:
+            await reset_app_cache()
+
+        print(
+            f"Seeded {args.posters} posters, {args.posts} posts, {args.tags} tags "
+            f"and {tagged_posts_n} tagged posts in {time.perf_counter() - started_at:.1f} s"
+        )
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posters", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--max-tags-per-post", type=int, default=5)
+    parser.add_argument("--max-text-words", type=int, default=300)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password shared by all seeded posters")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, same seed gives the same dataset")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="records per COPY")
+    parser.add_argument(
+        "--truncate", action="store_true", help="replace existing data and flush the app's Redis database"
+    )
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
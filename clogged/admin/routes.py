@@ -30,9 +30,10 @@ router = APIRouter(
 )
 async def create_poster(
     registration_data: PosterAuthModel,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
 ):
-    poster_id = await add_poster(registration_data.username, registration_data.password, db)
+    poster_id = await add_poster(registration_data.username, registration_data.password, db, cache)
     return poster_id    
 
 
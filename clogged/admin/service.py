@@ -1,13 +1,23 @@
 from typing import Any
 from fastapi import HTTPException
 from clogged.poster.models import Poster
-from clogged.auth.service import invalidate_all_user_sessions, password_hasher
+from clogged.auth.service import hash_password, invalidate_all_user_sessions
+from clogged.post.cache import bump_feed_generation
+from clogged.poster.cache import bump_poster_directory_version, publish_poster_change
 from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-async def add_poster(username: str, password: str, db: AsyncSession) -> dict[str, Any]:
+async def invalidate_changed_poster(poster_id: int, cache: Redis):
+    """Invalidates all cached data containing the changed or removed poster with the given id."""
+    await bump_poster_directory_version(cache)
+    await publish_poster_change(poster_id, cache)
+    # Feed pages may embed the poster's username.
+    await bump_feed_generation(cache)
+
+
+async def add_poster(username: str, password: str, db: AsyncSession, cache: Redis) -> dict[str, Any]:
     """Adds a new poster with the given username and password to the database and returns their's id."""
     # Check if such username already exists.
     query = select(Poster).where(Poster.username == username)
@@ -17,11 +27,12 @@ async def add_poster(username: str, password: str, db: AsyncSession) -> dict[str
         # but it allows to make code much cleaner and readable.
         raise HTTPException(status_code=400, detail="Poster with such username already exists")
     
-    credentials = password_hasher.hash(password)
+    credentials = await hash_password(password)
     poster = Poster(username=username, credentials=credentials)
     
     db.add(poster)
     await db.commit()
+    await bump_poster_directory_version(cache)
     return {"id": poster.id, "username": poster.username}
 
 
@@ -39,6 +50,7 @@ async def remove_poster(poster_id: int, db: AsyncSession, cache: Redis) -> dict[
 
     await db.delete(poster)
     await db.commit()
+    await invalidate_changed_poster(poster_id, cache)
     
     # Invalidate session in redis, so that the poster can't use an invalid id anymore.
     await invalidate_all_user_sessions(poster_id, cache)
@@ -60,12 +72,13 @@ async def update_poster_info(
         raise HTTPException(status_code=404, detail="Poster with such id does not exist")
 
     poster.username = new_username
-    poster.credentials = password_hasher.hash(new_password)
+    poster.credentials = await hash_password(new_password)
 
     # Invalidate session in redis to force poster to relogin with new credentials.
     await invalidate_all_user_sessions(poster_id, cache)
 
     await db.commit()
+    await invalidate_changed_poster(poster_id, cache)
     return {
         "id": poster.id,
         "username": poster.username
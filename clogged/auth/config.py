@@ -4,6 +4,14 @@ from pydantic_settings import BaseSettings
 class AuthConfig(BaseSettings):
     # Session expires in 30 days.
     CLOGGED_SESSION_EXPIRES_IN_SECONDS: int = 60*60*24*30
+    # Max number of concurrent argon2 hash computations per worker.
+    CLOGGED_PASSWORD_HASHING_MAX_CONCURRENCY: int = 4
+    # How long a login may wait for a free password hashing slot before being rejected.
+    CLOGGED_PASSWORD_HASHING_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    # Max number of validated sessions kept in memory per worker, the cache is opt-in and disabled by 0.
+    CLOGGED_SESSION_CACHE_SIZE: int = 0
+    # Revocations are pushed to all workers, the TTL only bounds staleness if a revocation notification is missed.
+    CLOGGED_SESSION_CACHE_TTL_SECONDS: float = 1.0
 
 
 settings = AuthConfig()
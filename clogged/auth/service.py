@@ -1,29 +1,78 @@
 from typing import Any
 from clogged.auth.config import settings as auth_settings
-from clogged.auth.utils import generate_session_id
+from clogged.auth.utils import generate_session_id, publish_session_invalidation, session_key, user_sessions_key
+from clogged.concurrency import BoundedExecutor, ExecutorBusyError
 from clogged.poster.models import Poster
 from argon2 import PasswordHasher
 from argon2.exceptions import VerificationError, InvalidHashError
+from fastapi import HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 
 
 password_hasher = PasswordHasher()
+# Argon2 hashing takes tens of milliseconds of CPU, so it's run off the event loop 
+# in threads (argon2-cffi releases the GIL) to not stall unrelated requests.
+password_hashing_executor = BoundedExecutor(
+    "password-hashing",
+    max_workers=auth_settings.CLOGGED_PASSWORD_HASHING_MAX_CONCURRENCY,
+    queue_timeout=auth_settings.CLOGGED_PASSWORD_HASHING_QUEUE_TIMEOUT_SECONDS
+)
+
+
+async def run_password_hashing(func, *args):
+    """Runs the given password hasher call in the password hashing executor."""
+    try:
+        return await password_hashing_executor.run(func, *args)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Too many concurrent password checks, try again later",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def hash_password(password: str) -> str:
+    """Returns the argon2 hash of the given password."""
+    return await run_password_hashing(password_hasher.hash, password)
+
+
+async def verify_password(credentials: str, password: str) -> bool:
+    """Returns whether the given password matches the given argon2 hash."""
+    try:
+        return await run_password_hashing(password_hasher.verify, credentials, password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
 async def invalidate_session(session_id: str, redis_client: Redis) -> bool:
     """Invalidates the session by the given session id and returns whether it succeeded."""
-    return bool(await redis_client.delete(session_id))
+    user_id = await redis_client.getdel(session_key(session_id))
+    if user_id is None:
+        return False
+    
+    await redis_client.srem(user_sessions_key(user_id), session_id)
+    await publish_session_invalidation([session_id], redis_client)
+    return True
     
 
 async def invalidate_all_user_sessions(user_id: int, redis_client: Redis) -> int:
     """Invalidates all sessions by the given user id and returns the number of invalidated sessions."""
-    sessions_invalidated_n = 0
-    keys = await redis_client.keys("*")
-    for key in keys:
-        if await redis_client.get(key) == str(user_id):
-            sessions_invalidated_n += await invalidate_session(key, redis_client)
+    user_sessions = user_sessions_key(user_id)
+    session_ids = await redis_client.smembers(user_sessions)
+    if not session_ids:
+        return 0
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        # The index may still list sessions that have already expired, 
+        # so the number of actually deleted keys is the number of invalidated sessions.
+        pipe.delete(*(session_key(session_id) for session_id in session_ids))
+        # Only remove the fetched ids, so that sessions created in the meantime stay indexed.
+        pipe.srem(user_sessions, *session_ids)
+        sessions_invalidated_n, _ = await pipe.execute()
+
+    await publish_session_invalidation(session_ids, redis_client)
     
     return sessions_invalidated_n
 
@@ -31,7 +80,14 @@ async def invalidate_all_user_sessions(user_id: int, redis_client: Redis) -> int
 async def create_session(user_id: int, redis_client: Redis) -> str:
     """Creates a new session for the given user id and returns the session id."""
     session_id = await generate_session_id()
-    await redis_client.set(session_id, user_id, ex=auth_settings.CLOGGED_SESSION_EXPIRES_IN_SECONDS)
+    user_sessions = user_sessions_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(session_key(session_id), user_id, ex=auth_settings.CLOGGED_SESSION_EXPIRES_IN_SECONDS)
+        pipe.sadd(user_sessions, session_id)
+        # The index never has to outlive the user's latest session.
+        pipe.expire(user_sessions, auth_settings.CLOGGED_SESSION_EXPIRES_IN_SECONDS)
+        await pipe.execute()
+    
     return session_id
 
 
@@ -47,15 +103,13 @@ async def authenticate_user(username: str, password: str, db: AsyncSession) -> d
     if poster is None:
         # Poster with such username does not exist.
         return None
-    try:
-        password_hasher.verify(poster.credentials, password)
-    except (VerificationError, InvalidHashError):
+    if not await verify_password(poster.credentials, password):
         # Password hashes do not match.
         return None
 
     # Passed password verification -> need to check if the password needs to be rehashed.
     if password_hasher.check_needs_rehash(poster.credentials):
-        poster.credentials = password_hasher.hash(password)
+        poster.credentials = await hash_password(password)
         await db.commit()
 
     return {"id": poster.id, "username": poster.username}
@@ -1,17 +1,77 @@
+import json
+from collections.abc import Iterable
 from secrets import token_urlsafe
+from clogged.auth.config import settings as auth_settings
+from clogged.lru import LRUCache
 from fastapi import Response
 from redis.asyncio import Redis
 
 
+# Redis pub/sub channel used to evict revoked sessions from the session caches of all workers.
+SESSION_INVALIDATIONS_CHANNEL = "auth:sessions:invalidated"
+
+# Per-worker cache of session ids mapped to user ids, sparing a redis round trip on bursts of authenticated requests.
+session_users = LRUCache(
+    maxsize=auth_settings.CLOGGED_SESSION_CACHE_SIZE,
+    ttl=auth_settings.CLOGGED_SESSION_CACHE_TTL_SECONDS
+)
+
+
+def session_key(session_id: str) -> str:
+    """Returns the redis key storing the user id of the session with the given id."""
+    return f"session:{session_id}"
+
+
+def user_sessions_key(user_id: int | str) -> str:
+    """Returns the redis key of the set of session ids of the given user."""
+    return f"user_sessions:{user_id}"
+
+
 async def generate_session_id() -> str:
     """Returns a url-safe 256 bit long random session id."""
     return token_urlsafe(32)
 
 
+def evict_cached_sessions(session_ids: Iterable[str]):
+    """Removes the sessions by the given ids from this worker's session cache."""
+    for session_id in session_ids:
+        session_users.pop(session_id)
+
+
+async def publish_session_invalidation(session_ids: Iterable[str], redis_client: Redis):
+    """Evicts the sessions by the given ids from the session caches of all workers, including this one."""
+    session_ids = list(session_ids)
+    evict_cached_sessions(session_ids)
+    await redis_client.publish(SESSION_INVALIDATIONS_CHANNEL, json.dumps(session_ids))
+
+
+async def apply_session_invalidation(message: str):
+    """Applies a session invalidation published by `publish_session_invalidation()`."""
+    evict_cached_sessions(json.loads(message))
+
+
+async def reset_cached_sessions():
+    session_users.clear()
+
+
 async def get_current_user(session_id: str, redis_client: Redis) -> int | None:
-    """Returns the user id by the given session id or None if session id is invalid."""
-    user_id = await redis_client.get(session_id)
-    return int(user_id) if user_id else None
+    """
+    Returns the user id by the given session id or None if session id is invalid.
+    Valid sessions are read through the per-worker session cache.
+    """
+    user_id = session_users.get(session_id)
+    if user_id is not None:
+        return user_id
+
+    # Sessions read before their revocation must not be cached after it.
+    generation = session_users.generation
+    user_id = await redis_client.get(session_key(session_id))
+    if not user_id:
+        return None
+
+    user_id = int(user_id)
+    session_users.set_if_unchanged(session_id, user_id, generation)
+    return user_id
 
 
 async def invalidate_session_cookie(response: Response):
@@ -0,0 +1,67 @@
+import gzip
+from clogged.config import settings as app_settings
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Strong ETags must differ between content codings, so gzip-coded representations get a suffixed one.
+GZIP_ETAG_SUFFIX = "-gz"
+
+
+def _coding_quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Returns whether the given `Accept-Encoding` header value allows gzip-encoded responses."""
+    if not app_settings.CLOGGED_ENABLE_COMPRESSION or accept_encoding is None:
+        return False
+
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        qualities[name.strip().lower()] = _coding_quality(params)
+
+    # An explicit gzip entry takes precedence over the `*` wildcard regardless of their order.
+    quality = qualities.get("gzip", qualities.get("*", 0.0))
+    # Explicitly refused with a zero quality value.
+    return quality > 0
+
+
+def gzip_compress(body: bytes) -> bytes:
+    """Returns gzip-compressed `body` using the configured compression level."""
+    return gzip.compress(body, compresslevel=app_settings.CLOGGED_COMPRESSION_LEVEL)
+
+
+def gzip_etag(etag: str) -> str:
+    """Returns the ETag of the gzip-coded representation of the entity with the given strong `etag`."""
+    if etag.startswith("W/") or etag.endswith(f'{GZIP_ETAG_SUFFIX}"'):
+        return etag
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+class GzipETagMiddleware:
+    """Suffixes strong ETags of gzip-coded responses, e.g. compressed by `GZipMiddleware`, which keeps them as is."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_gzip_etag(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if headers.get("content-encoding") == "gzip" and "etag" in headers:
+                    headers["etag"] = gzip_etag(headers["etag"])
+            await send(message)
+
+        await self.app(scope, receive, send_with_gzip_etag)
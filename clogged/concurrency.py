@@ -0,0 +1,40 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+
+
+class ExecutorBusyError(Exception):
+    """Raised when a call could not be admitted to a `BoundedExecutor` within its queue timeout."""
+    pass
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls off the event loop in a dedicated thread pool.
+
+    At most `max_workers` calls run at once, other calls wait for a free worker for up to `queue_timeout` seconds
+    and then fail with `ExecutorBusyError`, so a burst of expensive calls can't pile up unboundedly.
+    """
+    def __init__(self, name: str, *, max_workers: int, queue_timeout: float):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(max_workers)
+        self._queue_timeout = queue_timeout
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs `func(*args, **kwargs)` in the thread pool and returns its result."""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self._queue_timeout)
+        except TimeoutError:
+            raise ExecutorBusyError()
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """Stops the thread pool, cancelling not yet started calls."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
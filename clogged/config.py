@@ -22,6 +22,29 @@ class Config(BaseSettings):
     def CLOGGED_CORS_ALLOWED_ORIGINS(self) -> list[str]:
         # TODO: Add validation for the origins.
         return self.clogged_cors_allowed_origins.split(",")
+
+    # Gzip response compression for clients that accept it.
+    CLOGGED_ENABLE_COMPRESSION: bool = True
+    # Responses smaller than this (in bytes) are not worth compressing.
+    CLOGGED_COMPRESSION_MINIMUM_SIZE: int = 1024
+    CLOGGED_COMPRESSION_LEVEL: int = 6
+
+    # Expose Prometheus metrics of all workers at /metrics, which is unauthenticated.
+    CLOGGED_ENABLE_METRICS: bool = False
+    # Every worker publishes its metrics to redis this often for the worker serving /metrics to collect them.
+    CLOGGED_METRICS_PUBLISH_INTERVAL_SECONDS: float = 5.0
+    # Workers that haven't published their metrics for this long are considered gone.
+    CLOGGED_METRICS_WORKER_TTL_SECONDS: float = 30.0
+
+    # Statements taking longer than this are logged with their parameters' shape.
+    CLOGGED_SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    # Requests executing more statements than this are logged as likely N+1 offenders.
+    CLOGGED_REQUEST_QUERY_BUDGET: int = 20
+    # Log EXPLAIN ANALYZE of slow selects, only honored in development mode.
+    CLOGGED_EXPLAIN_SLOW_QUERIES: bool = False
+
+    # Serve list endpoints with a faster JSON encoder, skipping response model validation.
+    CLOGGED_ENABLE_FAST_RESPONSES: bool = False
     
 
     POSTGRES_HOST: str = "localhost"
@@ -29,24 +52,67 @@ class Config(BaseSettings):
     POSTGRES_USER: str = "clogged"
     POSTGRES_DB: str = "clogged"
     POSTGRES_PASSWORD: str = "sup3rs3cr3tpassw0rd"
+
+    """Backing field, use `POSTGRES_REPLICA_HOSTS` property instead."""
+    postgres_replica_hosts: str = Field(default="", alias="POSTGRES_REPLICA_HOSTS")
+    @property
+    def POSTGRES_REPLICA_HOSTS(self) -> list[tuple[str, int]]:
+        """Read replicas given as comma-separated `host` or `host:port`, sharing the primary's credentials."""
+        replica_hosts = []
+        for replica_host in filter(None, map(str.strip, self.postgres_replica_hosts.split(","))):
+            host, _, port = replica_host.partition(":")
+            replica_hosts.append((host, int(port) if port else self.POSTGRES_PORT))
+        return replica_hosts
+
+    # Connection pool settings of the primary database engine.
+    CLOGGED_DB_POOL_SIZE: int = 10
+    CLOGGED_DB_MAX_OVERFLOW: int = 10
+    CLOGGED_DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    CLOGGED_DB_POOL_PRE_PING: bool = False
+    # Prepared statements cached per connection, set to 0 behind a transaction-pooling pgbouncer.
+    CLOGGED_DB_STATEMENT_CACHE_SIZE: int = 100
+    # Same settings for each replica engine.
+    CLOGGED_DB_REPLICA_POOL_SIZE: int = 10
+    CLOGGED_DB_REPLICA_MAX_OVERFLOW: int = 10
+    CLOGGED_DB_REPLICA_POOL_TIMEOUT_SECONDS: float = 30.0
+    CLOGGED_DB_REPLICA_POOL_PRE_PING: bool = True
+    CLOGGED_DB_REPLICA_STATEMENT_CACHE_SIZE: int = 100
+    # Clients keep reading from the primary for this long after a write, so that they see their own writes.
+    CLOGGED_DB_PRIMARY_STICKINESS_SECONDS: int = 5
     
     
-    @computed_field
-    @property
-    def DATABASE_DSN(self) -> PostgresDsn:
+    def _build_database_dsn(self, host: str, port: int) -> PostgresDsn:
         return MultiHostUrl.build(
             scheme="postgresql+asyncpg",
-            host=self.POSTGRES_HOST,
-            port=self.POSTGRES_PORT,
+            host=host,
+            port=port,
             username=self.POSTGRES_USER,
             path=self.POSTGRES_DB,
             password=self.POSTGRES_PASSWORD
         )
+
+    @computed_field
+    @property
+    def DATABASE_DSN(self) -> PostgresDsn:
+        return self._build_database_dsn(self.POSTGRES_HOST, self.POSTGRES_PORT)
+
+    @computed_field
+    @property
+    def REPLICA_DATABASE_DSNS(self) -> list[PostgresDsn]:
+        return [self._build_database_dsn(host, port) for host, port in self.POSTGRES_REPLICA_HOSTS]
     
 
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: str = "0"
+    # Connection pool settings, the pool is shared by all redis clients of a worker.
+    CLOGGED_REDIS_MAX_CONNECTIONS: int = 64
+    # How long to wait for a free pooled connection before failing.
+    CLOGGED_REDIS_POOL_TIMEOUT_SECONDS: float = 5.0
+    CLOGGED_REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+    CLOGGED_REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    # Idle pooled connections are pinged before reuse after this interval.
+    CLOGGED_REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
 
     
     @computed_field
@@ -1,14 +1,70 @@
 from clogged.config import settings as app_settings
+from clogged.metrics import instrument_engine, instrumented_pool_class
+from clogged.profiling import profile_engine
 from clogged.post.models import Base as BaseModel
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 
-async_engine = create_async_engine(
-    app_settings.DATABASE_DSN.unicode_string(), 
-    echo=True
+def create_database_engine(
+    engine_name: str,
+    dsn: str,
+    *,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float,
+    pool_pre_ping: bool,
+    statement_cache_size: int
+) -> AsyncEngine:
+    """Returns an instrumented and profiled async engine with the given pool settings."""
+    engine = create_async_engine(
+        dsn,
+        poolclass=instrumented_pool_class(engine_name),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        connect_args={
+            # Both SQLAlchemy's and asyncpg's own prepared statement caches.
+            "prepared_statement_cache_size": statement_cache_size,
+            "statement_cache_size": statement_cache_size
+        }
+    )
+    instrument_engine(engine.sync_engine, engine_name)
+    profile_engine(engine.sync_engine, engine_name)
+    return engine
+
+
+async_engine = create_database_engine(
+    "primary",
+    app_settings.DATABASE_DSN.unicode_string(),
+    pool_size=app_settings.CLOGGED_DB_POOL_SIZE,
+    max_overflow=app_settings.CLOGGED_DB_MAX_OVERFLOW,
+    pool_timeout=app_settings.CLOGGED_DB_POOL_TIMEOUT_SECONDS,
+    pool_pre_ping=app_settings.CLOGGED_DB_POOL_PRE_PING,
+    statement_cache_size=app_settings.CLOGGED_DB_STATEMENT_CACHE_SIZE
 )
 
+replica_async_engines = [
+    create_database_engine(
+        f"replica{i}",
+        replica_dsn.unicode_string(),
+        pool_size=app_settings.CLOGGED_DB_REPLICA_POOL_SIZE,
+        max_overflow=app_settings.CLOGGED_DB_REPLICA_MAX_OVERFLOW,
+        pool_timeout=app_settings.CLOGGED_DB_REPLICA_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=app_settings.CLOGGED_DB_REPLICA_POOL_PRE_PING,
+        statement_cache_size=app_settings.CLOGGED_DB_REPLICA_STATEMENT_CACHE_SIZE
+    )
+    for i, replica_dsn in enumerate(app_settings.REPLICA_DATABASE_DSNS)
+]
+
 
 async def init_db():
+    # Only creates missing tables, existing databases are upgraded with the SQL files in `migrations`.
     async with async_engine.begin() as conn:
         await conn.run_sync(BaseModel.metadata.create_all)
+
+
+async def close_db():
+    await async_engine.dispose()
+    for replica_engine in replica_async_engines:
+        await replica_engine.dispose()
@@ -1,6 +1,9 @@
-from clogged.database import async_engine as async_database_engine
+import random
+from clogged.config import settings as app_settings
+from clogged.database import async_engine as async_database_engine, replica_async_engines
 from collections.abc import AsyncGenerator
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 
 AsyncSessionFactory = async_sessionmaker(
@@ -10,7 +13,57 @@ AsyncSessionFactory = async_sessionmaker(
     expire_on_commit=False
 )
 
+ReplicaSessionFactories = [
+    async_sessionmaker(
+        bind=replica_engine,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"is_replica": True}
+    )
+    for replica_engine in replica_async_engines
+]
+
+# Set on clients that have recently written, so that they keep reading their own writes from the primary.
+PRIMARY_STICKINESS_COOKIE = "read_primary"
+READ_ONLY_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+async def get_db(request: Request, response: Response) -> AsyncGenerator:
+    """Yields a primary database session, marking the client as sticky to the primary on writing requests."""
+    if ReplicaSessionFactories and request.method not in READ_ONLY_METHODS:
+        response.set_cookie(
+            PRIMARY_STICKINESS_COOKIE,
+            "1",
+            max_age=app_settings.CLOGGED_DB_PRIMARY_STICKINESS_SECONDS,
+            secure=True,
+            httponly=True,
+            samesite="strict"
+        )
 
-async def get_db() -> AsyncGenerator:
     async with AsyncSessionFactory() as session:
         yield session
+
+
+async def get_read_session_factory(request: Request) -> async_sessionmaker:
+    """
+    Returns the session factory of a random replica.
+    Falls back to the primary if there are no replicas or the client has written recently.
+    """
+    if not ReplicaSessionFactories or request.cookies.get(PRIMARY_STICKINESS_COOKIE):
+        return AsyncSessionFactory
+    return random.choice(ReplicaSessionFactories)
+
+
+async def get_read_db(session_factory: async_sessionmaker = Depends(get_read_session_factory)) -> AsyncGenerator:
+    """Yields a read-only database session, see `get_read_session_factory()`."""
+    async with session_factory() as session:
+        yield session
+
+
+def is_replica_session(db: AsyncSession) -> bool:
+    """
+    Returns whether the given session reads from a replica, which may lag behind the primary.
+    Data read from replicas must never fill shared caches, which would keep serving it after newer writes.
+    """
+    return db.info.get("is_replica", False)
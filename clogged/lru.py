@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class LRUCache:
+    """
+    Bounded per-worker in-memory cache, evicting the least recently used entries when full.
+    Entries also expire after `ttl` seconds if it's given.
+
+    Every entry counts as 1 towards `maxsize`, unless `weigh` is given to return an entry's size,
+    e.g. its length in bytes. Entries larger than `maxsize` are not cached at all.
+
+    `generation` is bumped by every invalidation (`pop()` or `clear()`), see `set_if_unchanged()`.
+    """
+    def __init__(self, maxsize: int, ttl: float | None = None, *, weigh: Callable[[Any], int] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._weigh = weigh
+        # Total size of the cached entries.
+        self._size = 0
+        # Values along with their size and monotonic expiration time, if any.
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float | None]] = OrderedDict()
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Returns the value cached by the given key or None if it's not cached or has expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, _, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        size = self._weigh(value) if self._weigh is not None else 1
+        if size > self.maxsize:
+            return
+
+        self._remove(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, size, expires_at)
+        self._size += size
+        while self._size > self.maxsize:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def set_if_unchanged(self, key: Hashable, value: Any, generation: int):
+        """
+        Caches the value unless the cache was invalidated since `generation` was read, 
+        so that a value read from its source before an invalidation is never cached after it.
+        """
+        if generation == self.generation:
+            self.set(key, value)
+
+    def pop(self, key: Hashable):
+        self.generation += 1
+        self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
@@ -1,20 +1,68 @@
+import asyncio
+from clogged.compression import GzipETagMiddleware
 from clogged.config import settings as app_settings
-from clogged.database import init_db
+from clogged.database import close_db, init_db
+from clogged.metrics import (
+    MetricsMiddleware, 
+    get_workers_samples, 
+    publish_worker_metrics_periodically, 
+    render_metrics
+)
+from clogged.profiling import QueryBudgetMiddleware
+from clogged.redis import (
+    add_resync_handler,
+    close_redis, 
+    get_redis, 
+    init_redis, 
+    listen_for_invalidations, 
+    subscribe_to_invalidations
+)
+from clogged.post.cache import reset_compressed_posts
+from clogged.post.registry import TAG_REGISTRY_CHANNEL, tag_registry
+from clogged.poster.cache import POSTER_CHANGES_CHANNEL, apply_poster_change, reset_poster_usernames
+from clogged.auth.service import password_hashing_executor
+from clogged.auth.utils import SESSION_INVALIDATIONS_CHANNEL, apply_session_invalidation, reset_cached_sessions
+from clogged.post.utils import import_executor, sanitization_executor
 from clogged.admin.routes import router as admin_router
 from clogged.auth.routes import router as auth_router
 from clogged.post.routes import router as post_router
 from clogged.poster.routes import router as poster_router 
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from redis.asyncio import Redis
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):        
     await init_db()
+    await init_redis()
+    await tag_registry.load()
+
+    # Keep per-worker in-memory state in sync with other workers.
+    subscribe_to_invalidations(TAG_REGISTRY_CHANNEL, tag_registry.apply_change, tag_registry.load)
+    subscribe_to_invalidations(POSTER_CHANGES_CHANNEL, apply_poster_change, reset_poster_usernames)
+    subscribe_to_invalidations(SESSION_INVALIDATIONS_CHANNEL, apply_session_invalidation, reset_cached_sessions)
+    add_resync_handler(reset_compressed_posts)
+    redis_client = await get_redis()
+    background_tasks = [asyncio.create_task(listen_for_invalidations(redis_client))]
+    if app_settings.CLOGGED_ENABLE_METRICS:
+        background_tasks.append(asyncio.create_task(publish_worker_metrics_periodically(redis_client)))
+
     yield
 
+    for background_task in background_tasks:
+        background_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await background_task
+    await close_redis()
+    await close_db()
+    password_hashing_executor.shutdown()
+    sanitization_executor.shutdown()
+    import_executor.shutdown()
+
 
 app = FastAPI(
     title="Clogged API",
@@ -37,16 +85,54 @@ app.add_middleware(
     allow_origins=app_settings.CLOGGED_CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Pagination cursors and validators are returned in headers, which browsers hide from scripts unless exposed.
+    expose_headers=["X-Next-Cursor", "ETag"]
 )
 
 
+# Responses that are already compressed (e.g. cached compressed posts) are passed through as is.
+if app_settings.CLOGGED_ENABLE_COMPRESSION:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=app_settings.CLOGGED_COMPRESSION_MINIMUM_SIZE,
+        compresslevel=app_settings.CLOGGED_COMPRESSION_LEVEL
+    )
+    # Added after compression to see the compressed responses' headers.
+    app.add_middleware(GzipETagMiddleware)
+
+
+app.add_middleware(QueryBudgetMiddleware)
+
+
+# Added last to be the outermost middleware, so that it measures the whole request handling.
+if app_settings.CLOGGED_ENABLE_METRICS:
+    app.add_middleware(MetricsMiddleware)
+
+
 app.include_router(admin_router)
 app.include_router(auth_router)
 app.include_router(post_router)
 app.include_router(poster_router)
 
 
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False
+)
+async def get_metrics(cache: Redis = Depends(get_redis)):
+    """
+    Provide metrics of all workers labeled by worker in the Prometheus text format only if metrics are enabled.
+    Any worker may serve the scrape, since all of them share the port.
+    """
+    if not app_settings.CLOGGED_ENABLE_METRICS:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    
+    metrics = render_metrics(await get_workers_samples(cache))
+    return PlainTextResponse(metrics, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Explicitly define Rapidoc UI endpoint.
 @app.get(
     "/docs",
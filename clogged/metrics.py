@@ -0,0 +1,296 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable
+from clogged.config import settings as app_settings
+from redis.asyncio import Redis
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second slow requests.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(label_names: Iterable[str], label_values: Iterable[str]) -> str:
+    labels = ",".join(
+        f"{name}=\"{_escape_label_value(value)}\"" for name, value in zip(label_names, label_values)
+    )
+    return f"{{{labels}}}" if labels else ""
+
+
+# Workers share the app's port, so a scrape reaches a random worker, which serves the metrics of all live workers
+# published to redis under the sorted set of their ids scored by the last publishing time.
+METRICS_WORKERS_KEY = "metrics:workers"
+
+
+def worker_metrics_key(worker_id: str) -> str:
+    """Returns the redis key of the last published metrics samples of the worker with the given id."""
+    return f"metrics:worker:{worker_id}"
+
+
+@functools.cache
+def worker_id() -> str:
+    """Returns the id of the current worker process, unique among all hosts running the app."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Metric(ABC):
+    """Base class of per-worker metrics rendered in the Prometheus text exposition format."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        metrics_registry.append(self)
+
+    def _label_values(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self, const_labels: dict[str, str]) -> Iterable[str]:
+        """Yields the metric's samples, each labeled with the given constant labels first."""
+
+    def render(self, samples: Iterable[str]) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{sample}\n" for sample in samples)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._label_values(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, const_labels: dict[str, str]) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            labels = _format_labels((*const_labels, *self.label_names), (*const_labels.values(), *label_values))
+            yield f"{self.name}{labels} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        # Non-cumulative bucket counts with the last one being the +Inf bucket, sum and count per label values.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._label_values(labels)
+        if key not in self._values:
+            self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        bucket_counts, total = self._values[key]
+        bucket_counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self, const_labels: dict[str, str]) -> Iterable[str]:
+        for label_values, (bucket_counts, total) in self._values.items():
+            label_names = (*const_labels, *self.label_names)
+            label_values = (*const_labels.values(), *label_values)
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip((*self.buckets, "+Inf"), bucket_counts):
+                cumulative_count += bucket_count
+                labels = _format_labels((*label_names, "le"), (*label_values, str(upper_bound)))
+                yield f"{self.name}_bucket{labels} {cumulative_count}"
+            labels = _format_labels(label_names, label_values)
+            yield f"{self.name}_sum{labels} {total[0]}"
+            yield f"{self.name}_count{labels} {cumulative_count}"
+
+
+metrics_registry: list[Metric] = []
+
+
+def collect_samples() -> dict[str, list[str]]:
+    """Returns samples of all metrics of the worker labeled with the worker's id by metric names."""
+    const_labels = {"worker": worker_id()}
+    return {metric.name: list(metric.samples(const_labels)) for metric in metrics_registry}
+
+
+def render_metrics(workers_samples: Iterable[dict[str, list[str]]]) -> str:
+    """Returns all metrics of the given workers' samples in the Prometheus text exposition format."""
+    workers_samples = list(workers_samples)
+    return "".join(
+        metric.render(sample for samples in workers_samples for sample in samples.get(metric.name, ()))
+        for metric in metrics_registry
+    )
+
+
+async def publish_worker_metrics(cache: Redis):
+    """Publishes the worker's metrics samples for other workers to serve them, see `get_workers_samples()`."""
+    now = time.time()
+    ttl = app_settings.CLOGGED_METRICS_WORKER_TTL_SECONDS
+    async with cache.pipeline(transaction=False) as pipe:
+        pipe.set(worker_metrics_key(worker_id()), json.dumps(collect_samples()), ex=int(ttl) + 1)
+        pipe.zadd(METRICS_WORKERS_KEY, {worker_id(): now})
+        # Forget workers that have stopped publishing.
+        pipe.zremrangebyscore(METRICS_WORKERS_KEY, "-inf", now - ttl)
+        await pipe.execute()
+
+
+async def publish_worker_metrics_periodically(cache: Redis):
+    """Publishes the worker's metrics every `CLOGGED_METRICS_PUBLISH_INTERVAL_SECONDS` until cancelled."""
+    while True:
+        try:
+            await publish_worker_metrics(cache)
+        except Exception:
+            logger.exception("Failed to publish worker metrics")
+        await asyncio.sleep(app_settings.CLOGGED_METRICS_PUBLISH_INTERVAL_SECONDS)
+
+
+async def get_workers_samples(cache: Redis) -> list[dict[str, list[str]]]:
+    """Returns metrics samples of all live workers, the current worker's ones being up to date."""
+    now = time.time()
+    worker_ids = [
+        other_worker_id 
+        for other_worker_id in await cache.zrangebyscore(
+            METRICS_WORKERS_KEY, now - app_settings.CLOGGED_METRICS_WORKER_TTL_SECONDS, "+inf"
+        )
+        if other_worker_id != worker_id()
+    ]
+    serialized_samples = []
+    if worker_ids:
+        serialized_samples = await cache.mget([worker_metrics_key(other_worker_id) for other_worker_id in worker_ids])
+    
+    return [collect_samples()] + [json.loads(samples) for samples in serialized_samples if samples is not None]
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "clogged_http_request_duration_seconds",
+    "HTTP request latency by route and status",
+    ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "clogged_http_requests_in_flight",
+    "Number of HTTP requests being currently served",
+    ("method",)
+)
+HTTP_REQUESTS_OVER_QUERY_BUDGET = Counter(
+    "clogged_http_requests_over_query_budget_total",
+    "Number of HTTP requests that executed more SQL statements than the query budget",
+    ("method", "route")
+)
+DB_QUERY_DURATION = Histogram(
+    "clogged_db_query_duration_seconds",
+    "SQL statement execution latency by engine and statement type",
+    ("engine", "operation")
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "clogged_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the engine's pool",
+    ("engine",)
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "clogged_redis_command_duration_seconds",
+    "Redis command latency by command, pipelines are reported as PIPELINE",
+    ("command",)
+)
+REDIS_POOL_CHECKOUT_WAIT = Histogram(
+    "clogged_redis_pool_checkout_wait_seconds",
+    "Time spent waiting for a redis connection from the pool"
+)
+POST_SANITIZATION_DURATION = Histogram(
+    "clogged_post_sanitization_duration_seconds",
+    "Time spent sanitizing large post inputs off the event loop, including waiting for a free worker"
+)
+
+
+class MetricsMiddleware:
+    """Records latency and number of in-flight HTTP requests."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method=method)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method=method)
+            # Label by the route's path template to keep the number of label values bounded.
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started_at,
+                method=method,
+                route=route.path if route is not None else "<unmatched>",
+                status=status
+            )
+
+
+def instrument_engine(engine: Engine, engine_name: str):
+    """Records latency of all SQL statements executed by the given (sync) engine."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query_duration(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started_at"].pop()
+        operation = statement.lstrip().split(maxsplit=1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_QUERY_DURATION.observe(duration, engine=engine_name, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def discard_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+def instrumented_pool_class(engine_name: str) -> type[AsyncAdaptedQueuePool]:
+    """Returns an async engine pool class recording connection checkout wait times of the given engine."""
+    class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started_at = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at, engine=engine_name)
+
+    return InstrumentedAsyncAdaptedQueuePool
@@ -0,0 +1,155 @@
+from typing import Any
+from collections.abc import Iterable
+from datetime import datetime
+from hashlib import sha1
+from clogged.lru import LRUCache
+from clogged.post.config import settings as post_settings
+from clogged.post.schemas import PostInfoModel, PostModel
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+
+
+# Bumped on every post write, so that cached feed pages of older generations are never read again
+# and simply expire instead of being looked up and deleted.
+FEED_GENERATION_KEY = "feed:generation"
+
+feed_page_adapter = TypeAdapter(list[PostInfoModel])
+
+# Per-worker cache of gzip-compressed post responses keyed by post ETags, 
+# which change along with the posts, so entries never have to be invalidated.
+# Bounded by the total size of compressed posts, since posts may be up to megabytes long.
+compressed_posts = LRUCache(maxsize=post_settings.CLOGGED_COMPRESSED_POST_CACHE_MAX_BYTES, weigh=len)
+
+
+async def reset_compressed_posts():
+    """Drops all compressed post responses, since post versions restart from 0 if the redis database is reset."""
+    compressed_posts.clear()
+
+
+def post_cache_key(post_id: int, version: int) -> str:
+    """
+    Returns the redis key of the cached given version of the post with the given id.
+    
+    Posts are cached per version, so that a post read before a change and cached after it 
+    is never read again, the same way feed pages are cached per feed generation.
+    """
+    return f"post:{post_id}:{version}"
+
+
+def post_version_key(post_id: int) -> str:
+    """Returns the redis key of the version of the post with the given id, which is bumped on every post change."""
+    # Expires `CLOGGED_POST_VERSION_TTL_SECONDS` after the last change, so that deleted posts don't leave keys forever.
+    # Restarting from version 0 could only make an ETag kept by a client for longer than that match again.
+    return f"post:{post_id}:version"
+
+
+async def get_cached_post(post_id: int, version: int, cache: Redis) -> dict[str, Any] | None:
+    """Returns the cached given version of the post by the given id or None if it's not cached."""
+    serialized_post = await cache.get(post_cache_key(post_id, version))
+    if serialized_post is None:
+        return None
+    
+    return PostModel.model_validate_json(serialized_post).model_dump()
+
+
+async def is_post_cached(post_id: int, version: int, cache: Redis) -> bool:
+    """Returns whether the given version of the post by the given id is cached, which implies the post exists."""
+    return bool(await cache.exists(post_cache_key(post_id, version)))
+
+
+async def cache_post(post: dict[str, Any], version: int, cache: Redis):
+    """Caches the given version of the given post for `CLOGGED_POST_CACHE_TTL_SECONDS`."""
+    serialized_post = PostModel.model_validate(post).model_dump_json()
+    await cache.set(
+        post_cache_key(post["id"], version), 
+        serialized_post, 
+        ex=post_settings.CLOGGED_POST_CACHE_TTL_SECONDS
+    )
+
+
+async def invalidate_cached_posts(post_ids: Iterable[int], cache: Redis):
+    """
+    Bumps versions of the posts by the given ids, so that their cached versions are never read again,
+    and invalidates all cached feed pages.
+    """
+    async with cache.pipeline(transaction=False) as pipe:
+        for post_id in post_ids:
+            pipe.incr(post_version_key(post_id))
+            pipe.expire(post_version_key(post_id), post_settings.CLOGGED_POST_VERSION_TTL_SECONDS)
+        pipe.incr(FEED_GENERATION_KEY)
+        await pipe.execute()
+
+
+async def get_post_version(post_id: int, cache: Redis) -> int:
+    """Returns the current version of the post with the given id."""
+    return int(await cache.get(post_version_key(post_id)) or 0)
+
+
+def post_etag(post_id: int, version: int, *, include_poster: bool = False, poster_username: str | None = None) -> str:
+    """
+    Returns the strong ETag of the given version of the post with the given id.
+    Posts with embedded authors also embed the author's username, since its changes don't bump post versions.
+    """
+    if include_poster:
+        return f'"post-{post_id}-{version}-poster-{poster_username or ""}"'
+    return f'"post-{post_id}-{version}"'
+
+
+def feed_etag(page_key: str, *, poster_usernames: Iterable[tuple[int, str | None]] | None = None) -> str:
+    """
+    Returns the strong ETag of the feed page with the given key, which already accounts for the feed generation.
+
+    Pages with embedded authors also hash the embedded `(poster_id, username)` pairs, 
+    since usernames are read after the generation and may be newer than it.
+    """
+    digest = sha1(page_key.encode())
+    if poster_usernames is None:
+        return f'"feed-{digest.hexdigest()}"'
+    
+    for poster_id, username in sorted(set(poster_usernames), key=lambda pair: pair[0]):
+        digest.update(f"\x00{poster_id}|{username or ''}".encode())
+    return f'"feed-{digest.hexdigest()}-poster"'
+
+
+async def bump_feed_generation(cache: Redis):
+    """Invalidates all cached feed pages."""
+    await cache.incr(FEED_GENERATION_KEY)
+
+
+async def get_feed_generation(cache: Redis) -> int:
+    """Returns the current feed generation."""
+    return int(await cache.get(FEED_GENERATION_KEY) or 0)
+
+
+def feed_cache_key(
+    generation: int,
+    tags: Iterable[str] | None,
+    *,
+    poster_id: int | None,
+    poster_username: str | None,
+    limit: int,
+    offset: int,
+    cursor: tuple[datetime, int] | None
+) -> str:
+    """Returns the redis key of the feed page of the given generation, normalized tag set, poster and page parameters."""
+    # Tag order and duplicates do not affect the page, hashing keeps the key short for long tag lists.
+    normalized_tags = "" if tags is None else "\x00".join(sorted(set(tags)))
+    tags_digest = sha1(normalized_tags.encode()).hexdigest() if tags is not None else "all"
+    poster_part = f"{'' if poster_id is None else poster_id}|{poster_username or ''}"
+    cursor_part = "" if cursor is None else f"{cursor[0].isoformat()}|{cursor[1]}"
+    return f"feed:{generation}:{tags_digest}:{poster_part}:{limit}:{offset}:{cursor_part}"
+
+
+async def get_cached_feed_page(key: str, cache: Redis) -> list[dict[str, Any]] | None:
+    """Returns the cached feed page by the given key or None if it's not cached."""
+    serialized_page = await cache.get(key)
+    if serialized_page is None:
+        return None
+
+    return feed_page_adapter.dump_python(feed_page_adapter.validate_json(serialized_page))
+
+
+async def cache_feed_page(key: str, posts: list[dict[str, Any]], cache: Redis):
+    """Caches the given feed page for `CLOGGED_FEED_CACHE_TTL_SECONDS`."""
+    serialized_page = feed_page_adapter.dump_json(feed_page_adapter.validate_python(posts))
+    await cache.set(key, serialized_page, ex=post_settings.CLOGGED_FEED_CACHE_TTL_SECONDS)
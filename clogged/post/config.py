@@ -0,0 +1,48 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PostConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Cached posts expire in 10 minutes.
+    CLOGGED_POST_CACHE_TTL_SECONDS: int = 60*10
+    # Post versions backing ETags expire in 90 days after the post's last change,
+    # which has to outlive any copy of the post kept by clients.
+    CLOGGED_POST_VERSION_TTL_SECONDS: int = 60*60*24*90
+    # Cached feed pages expire in 1 minute, stale generations are never read anyway.
+    CLOGGED_FEED_CACHE_TTL_SECONDS: int = 60
+    # Max total size in bytes of gzip-compressed post responses kept in memory per worker.
+    CLOGGED_COMPRESSED_POST_CACHE_MAX_BYTES: int = 32*1024*1024
+
+    # Tag name length limit in characters and max number of tags per post.
+    CLOGGED_TAG_MAX_LENGTH: int = 32
+    CLOGGED_POST_MAX_TAGS: int = 16
+    # Max number of unknown tags a single request may create, since every tag is kept in memory by every worker.
+    CLOGGED_TAG_MAX_CREATED_PER_REQUEST: int = 100
+
+    # Post size limits in characters, enforced before sanitizing.
+    CLOGGED_POST_MAX_TITLE_LENGTH: int = 512
+    CLOGGED_POST_MAX_TEXT_LENGTH: int = 1024*1024
+    # Posts longer than this (in characters) are sanitized in a worker thread pool instead of on the event loop.
+    CLOGGED_POST_SANITIZATION_OFFLOAD_THRESHOLD: int = 16*1024
+    # Max number of concurrently sanitized large posts per worker.
+    CLOGGED_POST_SANITIZATION_MAX_CONCURRENCY: int = 2
+    # How long a large post may wait for a free sanitization slot before being rejected.
+    CLOGGED_POST_SANITIZATION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+
+    # Max number of posts accepted by a single bulk import request.
+    CLOGGED_POST_IMPORT_MAX_ITEMS: int = 10000
+    # Max bulk import request body size in bytes, bodies are buffered whole before parsing.
+    CLOGGED_POST_IMPORT_MAX_BODY_SIZE: int = 32*1024*1024
+    # Number of posts inserted by a single bulk import statement.
+    CLOGGED_POST_IMPORT_BATCH_SIZE: int = 1000
+    # Max number of concurrently parsed bulk imports per worker, they don't share the sanitization thread pool.
+    CLOGGED_POST_IMPORT_MAX_CONCURRENCY: int = 1
+    # How long a bulk import may wait for a free parsing slot before being rejected.
+    CLOGGED_POST_IMPORT_QUEUE_TIMEOUT_SECONDS: float = 30.0
+
+    # Number of posts fetched from the server-side cursor at once when exporting posts.
+    CLOGGED_POST_EXPORT_BATCH_SIZE: int = 1000
+
+
+settings = PostConfig()
@@ -1,23 +1,35 @@
 from clogged.dependencies import get_db
-from clogged.post.schemas import PostCreationModel
+from clogged.post.config import settings as post_settings
+from clogged.redis import get_redis
+from clogged.post.schemas import PostCreationModel, PostImportModel
 from clogged.schemas import IdType
 from clogged.post.service import get_post
+from clogged.post.utils import decode_post_cursor, decode_search_cursor, parse_post_data, parse_posts_import
 from clogged.auth.dependencies import verify_user_auth
-from fastapi import Depends, HTTPException
+from datetime import datetime
+from fastapi import Depends, HTTPException, Request
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
-import nh3
+
+
+# Max post input body size in bytes: JSON may escape every character of a post as `\uXXXX`,
+# which takes up to 12 bytes per character (as a surrogate pair), plus an allowance for keys, tags and whitespace.
+POST_MAX_BODY_SIZE = (
+    12*(post_settings.CLOGGED_POST_MAX_TITLE_LENGTH + post_settings.CLOGGED_POST_MAX_TEXT_LENGTH) + 64*1024
+)
 
 
 async def verify_poster_authorship(
     post_id: IdType,
     db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis),
     poster_id: int = Depends(verify_user_auth),
 ) -> int:
     """
     Checks that the given `poster_id` is the author of the post with the given `post_id`.
     Returns the `post_id` if the authorship is verified, otherwise raises a relevant HTTPException.
     """
-    post = await get_post(post_id, db)
+    post = await get_post(post_id, db, cache)
     if post is None:
         raise HTTPException(status_code=404, detail="Post with such id does not exist")
     
@@ -27,10 +39,62 @@ async def verify_poster_authorship(
     return post_id
 
 
-async def sanitize_post_input_data(
-    post_data: PostCreationModel
-) -> PostCreationModel:
-    """Returns HTML-sanitized post input data."""
-    post_data.text = nh3.clean(post_data.text)
-    post_data.title = nh3.clean(post_data.title)
-    return post_data
+async def sanitize_post_input_data(request: Request) -> PostCreationModel:
+    """
+    Returns HTML-sanitized post input data parsed from the JSON request body.
+    Bodies that can't fit a post of the max title and text lengths are rejected before being parsed.
+    """
+    body = await read_limited_body(request, POST_MAX_BODY_SIZE)
+    return await parse_post_data(body)
+
+
+async def read_limited_body(request: Request, max_size: int) -> bytes:
+    """Returns the request body, rejecting bodies larger than `max_size` bytes without reading them whole."""
+    too_large_error = HTTPException(status_code=413, detail=f"Request body can't be larger than {max_size} bytes")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+        raise too_large_error
+
+    # Content-Length may be missing (chunked bodies) or lie, so the streamed size is checked too.
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_size:
+            raise too_large_error
+    return bytes(body)
+
+
+async def parse_post_import_data(request: Request) -> list[PostImportModel | str]:
+    """
+    Returns posts parsed from either a JSON array or an NDJSON (`application/x-ndjson`) request body
+    and HTML-sanitized the same way as `sanitize_post_input_data()`. 
+    
+    Posts that could not be parsed are replaced by their error message.
+    """
+    body = await read_limited_body(request, post_settings.CLOGGED_POST_IMPORT_MAX_BODY_SIZE)
+    ndjson = request.headers.get("content-type", "").startswith("application/x-ndjson")
+    return await parse_posts_import(body, ndjson=ndjson)
+
+
+async def parse_post_cursor(cursor: str | None = None) -> tuple[datetime, int] | None:
+    """Returns the `(created_at, post_id)` pair decoded from the opaque `cursor` query parameter if it's given."""
+    if cursor is None:
+        return None
+
+    decoded_cursor = decode_post_cursor(cursor)
+    if decoded_cursor is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return decoded_cursor
+
+
+async def parse_search_cursor(cursor: str | None = None) -> tuple[float, int] | None:
+    """Returns the `(rank, post_id)` pair decoded from the opaque search `cursor` query parameter if it's given."""
+    if cursor is None:
+        return None
+
+    decoded_cursor = decode_search_cursor(cursor)
+    if decoded_cursor is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return decoded_cursor
@@ -1,9 +1,15 @@
+from datetime import datetime
 from clogged.models import Base
-from sqlalchemy import Integer, TEXT, ForeignKey, TIMESTAMP
+from sqlalchemy import Computed, Index, Integer, TEXT, ForeignKey, TIMESTAMP
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
 
+# Text search configuration used both to build and to query the posts' search vectors.
+SEARCH_TEXT_CONFIG = "english"
+
+
 class Post(Base):
     __tablename__ = "posts"
 
@@ -11,9 +17,27 @@ class Post(Base):
     poster_id: Mapped[int] = mapped_column(ForeignKey("posters.id"))
     title: Mapped[str] = mapped_column(TEXT)
     created_at: Mapped[int] = mapped_column(TIMESTAMP(timezone=True), default=func.now())
-    # TODO: look into document-oriented databases, which may be better at storing large texts
-    # and providing search functions on them.
+    # TODO: look into document-oriented databases, which may be better at storing large texts.
     text: Mapped[str] = mapped_column(TEXT)
+    # Full-text search document with title matches weighted above text matches, maintained by postgres itself.
+    # Deferred since it's only ever used in search conditions and never needs to be loaded.
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', title), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', text), 'B')",
+            persisted=True
+        ),
+        deferred=True
+    )
+
+
+# Backs keyset pagination of the latest posts feed.
+Index("ix_posts_created_at_id", Post.created_at.desc(), Post.id.desc())
+# Backs keyset pagination of a single poster's feed.
+Index("ix_posts_poster_id_created_at_id", Post.poster_id, Post.created_at.desc(), Post.id.desc())
+# Backs full-text search.
+Index("ix_posts_search_vector", Post.search_vector, postgresql_using="gin")
 
 
 class PostTag(Base):
@@ -21,11 +45,15 @@ class PostTag(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, unique=True, autoincrement=True)
     name: Mapped[str] = mapped_column(TEXT, unique=True)
+    # Tag statistics maintained by post writes, so that they never have to be aggregated at read time.
+    posts_n: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_used_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
 
 
 class TaggedPost(Base):
     __tablename__ = "tagged_posts"
     
-    # The primary key is a composite of post_id and tag_id.
-    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id"), primary_key=True, unique=True)
-    tag_id: Mapped[int] = mapped_column(ForeignKey("post_tags.id"), primary_key=True, unique=True)
+    # The primary key is a composite of post_id and tag_id, so a post may have many tags and vice versa.
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id"), primary_key=True)
+    # The primary key index only backs lookups by post_id, so tag_id needs its own one for tag filtering.
+    tag_id: Mapped[int] = mapped_column(ForeignKey("post_tags.id"), primary_key=True, index=True)
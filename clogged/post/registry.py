@@ -0,0 +1,59 @@
+import json
+from collections.abc import Iterable
+from clogged.dependencies import AsyncSessionFactory
+from clogged.post.models import PostTag
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+
+# Redis pub/sub channel used to keep tag registries of all workers in sync.
+TAG_REGISTRY_CHANNEL = "post:tags:changes"
+
+
+class TagRegistry:
+    """
+    Per-worker in-memory mirror of the `post_tags` table mapping tag names to tag ids.
+
+    The tag table is tiny and rarely changes, so resolving tags in memory saves a database round trip 
+    on every post write and filtered feed read.
+    """
+    def __init__(self):
+        self._tag_ids: dict[str, int] = {}
+        self.is_loaded = False
+
+    async def load(self):
+        """(Re)loads all tags from the database."""
+        async with AsyncSessionFactory() as db:
+            result = await db.execute(select(PostTag.id, PostTag.name))
+            self._tag_ids = {name: tag_id for tag_id, name in result.all()}
+        self.is_loaded = True
+
+    def match(self, tags: Iterable[str]) -> dict[int, str]:
+        """Returns a dictionary of tag ids mapped to tag names by the given tag names, unknown tags are skipped."""
+        return {self._tag_ids[tag]: tag for tag in tags if tag in self._tag_ids}
+
+    def add(self, tag_id: int, tag: str):
+        self._tag_ids[tag] = tag_id
+
+    def remove(self, tag: str):
+        self._tag_ids.pop(tag, None)
+
+    async def apply_change(self, message: str):
+        """Applies a tag change published by `publish_tag_change()`."""
+        change = json.loads(message)
+        for tag_id, tag in change["tags"]:
+            if change["op"] == "add":
+                self.add(tag_id, tag)
+            else:
+                self.remove(tag)
+
+
+tag_registry = TagRegistry()
+
+
+async def publish_tag_change(op: str, tags: dict[int, str], cache: Redis):
+    """
+    Notifies all workers' tag registries that the given tags (tag ids mapped to tag names) 
+    were either added (`op="add"`) or deleted (`op="delete"`).
+    """
+    await cache.publish(TAG_REGISTRY_CHANNEL, json.dumps({"op": op, "tags": list(tags.items())}))
@@ -1,18 +1,53 @@
-from clogged.dependencies import get_db
+from clogged.compression import accepts_gzip, gzip_compress, gzip_etag
+from clogged.config import settings as app_settings
+from clogged.dependencies import get_db, get_read_db, get_read_session_factory
+from clogged.redis import get_redis
+from clogged.responses import fast_response
 from clogged.schemas import IdType
-from clogged.post.dependencies import sanitize_post_input_data, verify_poster_authorship
+from clogged.post.dependencies import (
+    parse_post_cursor, 
+    parse_post_import_data,
+    parse_search_cursor, 
+    sanitize_post_input_data, 
+    verify_poster_authorship
+)
 from clogged.post import service as post_service
+from clogged.post.cache import (
+    compressed_posts,
+    feed_cache_key, 
+    feed_etag, 
+    get_feed_generation, 
+    get_post_version, 
+    is_post_cached,
+    post_etag
+)
+from clogged.post.utils import encode_post_cursor, encode_search_cursor, matching_etag
 from clogged.post.schemas import (
     PostCreationModel, 
+    PostImportModel,
+    PostIncludeOption,
+    PostInfoWithPosterModel,
+    PostImportResultModel,
     PostInfoModel, 
     PostModel, 
+    PostWithPosterModel,
     PostOffset, 
     PostLimit,
-    TagModel
+    PostSearchResultModel,
+    TagModel,
+    TagNameType,
+    TagStatsModel
 ) 
 from clogged.auth.dependencies import verify_user_auth
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from clogged.auth.schemas import UsernameType
+from collections.abc import AsyncIterator
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 
 router = APIRouter(
@@ -20,81 +55,325 @@ router = APIRouter(
     tags=["post"]
 )
 
+# Post input bodies are read by hand to limit their size before parsing, so document them explicitly.
+POST_CREATION_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": PostCreationModel.model_json_schema()}}
+    }
+}
+
+
+def not_modified_response(etag: str) -> Response:
+    """Returns an empty 304 Not Modified response for the given ETag."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def compressed_post_response(compressed_post: bytes, etag: str) -> Response:
+    """Returns a response with the given gzip-compressed serialized post and the gzip variant of its ETag."""
+    return Response(
+        content=compressed_post,
+        media_type="application/json",
+        headers={
+            "Content-Encoding": "gzip",
+            "Vary": "Accept-Encoding",
+            "ETag": gzip_etag(etag),
+            "Cache-Control": "no-cache"
+        }
+    )
+
+
+def set_etag(response: Response, etag: str):
+    """Makes the response revalidatable by the given ETag."""
+    response.headers["ETag"] = etag
+    # Let clients and CDNs store the response, but always revalidate it.
+    response.headers["Cache-Control"] = "no-cache"
+
 
 @router.get(
     "/{post_id}",
-    description="Returns post by the given post id",
-    response_model=PostModel,
+    description="Returns post by the given post id, with the author's username if include=poster is given. \
+                Supports conditional requests with the If-None-Match header and the returned ETag",
+    response_model=PostWithPosterModel,
+    response_model_exclude_unset=True,
     status_code=200
 )
 async def get_post(
     post_id: IdType,
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    include: list[PostIncludeOption] | None = Query(None),
+    if_none_match: str | None = Header(None),
+    accept_encoding: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    cache: Redis = Depends(get_redis)
 ):
-    post = await post_service.get_post(post_id, db)
+    # The version is read before the post, so the ETag can never be newer than the returned post.
+    version = await get_post_version(post_id, cache)
+
+    post = None
+    is_current = True
+    poster_username = None
+    include_poster = include is not None and "poster" in include
+    if include_poster:
+        # The author's username is a part of the ETag, so the post has to be read first.
+        post, is_current = await post_service.get_versioned_post(post_id, version, db, cache)
+        if post is None:
+            raise HTTPException(status_code=404, detail="Post with such id does not exist")
+        await post_service.embed_poster_usernames([post], db)
+        poster_username = post["poster_username"]
+
+    etag = post_etag(post_id, version, include_poster=include_poster, poster_username=poster_username)
+    if (matched_etag := matching_etag(if_none_match, etag)) is not None:
+        # Missing posts have no current representation to match, not even `If-None-Match: *`.
+        if post is None and not await is_post_cached(post_id, version, cache):
+            post, _ = await post_service.get_versioned_post(post_id, version, db, cache)
+            if post is None:
+                raise HTTPException(status_code=404, detail="Post with such id does not exist")
+        return not_modified_response(matched_etag)
+
+    use_gzip = accepts_gzip(accept_encoding)
+    if use_gzip and (compressed_post := compressed_posts.get(etag)) is not None:
+        return compressed_post_response(compressed_post, etag)
+
     if post is None:
-        raise HTTPException(status_code=404, detail="Post with such id does not exist")
+        post, is_current = await post_service.get_versioned_post(post_id, version, db, cache)
+        if post is None:
+            raise HTTPException(status_code=404, detail="Post with such id does not exist")
+    if not is_current:
+        # Posts read from a lagging replica may predate the version, so they're never served under its ETag.
+        return post
+    
+    if use_gzip:
+        serialized_post = PostWithPosterModel.model_validate(post).model_dump_json(exclude_unset=True).encode()
+        if len(serialized_post) >= app_settings.CLOGGED_COMPRESSION_MINIMUM_SIZE:
+            # Compress hot posts only once instead of on every request.
+            compressed_post = gzip_compress(serialized_post)
+            compressed_posts.set(etag, compressed_post)
+            return compressed_post_response(compressed_post, etag)
+
+    set_etag(response, etag)
     return post
     
 
-# TODO: Add an ability to provide a poster username to filter by,
-# so that the poster would be able to modify/delete their posts, knowing post ids. 
 @router.get(
     "/latest/",
-    description="Returns the latest posts info by the given offset, \
-                limit and containing at least one of the given tags",
-    response_model=list[PostInfoModel],
+    description="Returns the latest posts info by the given offset or cursor, \
+                limit, containing at least one of the given tags and posted by the given poster id and/or username. \
+                The cursor for the next page is returned in the X-Next-Cursor header if there may be more posts. \
+                Authors' usernames are embedded if include=poster is given. \
+                Supports conditional requests with the If-None-Match header and the returned ETag",
+    response_model=list[PostInfoWithPosterModel],
+    response_model_exclude_unset=True,
     status_code=200
 )
 async def get_posts(
+    response: Response,
+    include: list[PostIncludeOption] | None = Query(None),
+    if_none_match: str | None = Header(None),
     tags: list[str] | None = Query(None, alias="tag"),
+    poster_id: IdType | None = None,
+    poster: UsernameType | None = None,
     offset: PostOffset = 0,
     limit: PostLimit = 5,
-    db: AsyncSession = Depends(get_db)
+    cursor: tuple[datetime, int] | None = Depends(parse_post_cursor),
+    db: AsyncSession = Depends(get_read_db),
+    cache: Redis = Depends(get_redis)
 ):
-    posts = await post_service.get_latest_posts_info(tags, limit=limit, offset=offset, db=db)
-    return posts
+    # The generation is read before the page, so the ETag can never be newer than the returned page.
+    generation = await get_feed_generation(cache)
+    include_poster = include is not None and "poster" in include
+    page_key = feed_cache_key(
+        generation, 
+        tags, 
+        poster_id=poster_id, 
+        poster_username=poster, 
+        limit=limit, 
+        offset=offset, 
+        cursor=cursor
+    )
+    if not include_poster:
+        etag = feed_etag(page_key)
+        if (matched_etag := matching_etag(if_none_match, etag)) is not None:
+            return not_modified_response(matched_etag)
+
+    posts, is_current = await post_service.get_latest_posts_info(
+        tags, 
+        poster_id=poster_id,
+        poster_username=poster,
+        limit=limit, 
+        offset=offset, 
+        cursor=cursor, 
+        generation=generation,
+        db=db, 
+        cache=cache
+    )
+    if include_poster:
+        # Authors' usernames are a part of the ETag, so the page has to be read first.
+        await post_service.embed_poster_usernames(posts, db)
+        etag = feed_etag(page_key, poster_usernames=((post["poster_id"], post["poster_username"]) for post in posts))
+        if is_current and (matched_etag := matching_etag(if_none_match, etag)) is not None:
+            return not_modified_response(matched_etag)
+
+    # Pages read from a lagging replica may predate the generation, so they're never served under its ETag.
+    if is_current:
+        set_etag(response, etag)
+    if posts and len(posts) == limit:
+        last_post = posts[-1]
+        response.headers["X-Next-Cursor"] = encode_post_cursor(last_post["created_at"], last_post["id"])
+    return fast_response(posts, response)
+
+
+@router.get(
+    "/search/",
+    description="Returns posts info matching the given web search query ordered by relevance, \
+                by the given cursor, limit and containing at least one of the given tags. \
+                The cursor for the next page is returned in the X-Next-Cursor header if there may be more posts",
+    response_model=list[PostSearchResultModel],
+    status_code=200
+)
+async def search_posts(
+    response: Response,
+    q: str = Query(min_length=1),
+    tags: list[str] | None = Query(None, alias="tag"),
+    limit: PostLimit = 5,
+    cursor: tuple[float, int] | None = Depends(parse_search_cursor),
+    db: AsyncSession = Depends(get_read_db)
+):
+    posts = await post_service.search_posts(q, tags, limit=limit, cursor=cursor, db=db)
+    if posts and len(posts) == limit:
+        last_post = posts[-1]
+        response.headers["X-Next-Cursor"] = encode_search_cursor(last_post["rank"], last_post["id"])
+    return fast_response(posts, response)
+
+
+async def ndjson_post_lines(post_batches: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    """Yields batches of posts as NDJSON lines, each carrying the cursor to resume the export right after it."""
+    async for posts in post_batches:
+        yield b"".join(
+            to_json({**post, "cursor": encode_post_cursor(post["created_at"], post["id"])}) + b"\n"
+            for post in posts
+        )
+
+
+@router.get(
+    "/export/",
+    description="Streams all posts, containing at least one of the given tags, posted by the given poster id \
+                and/or username and created in the [since, until) range, oldest first as NDJSON. \
+                Each line carries a cursor, so an interrupted export can be resumed by passing the last received one",
+    response_class=StreamingResponse,
+    status_code=200
+)
+async def export_posts(
+    tags: list[str] | None = Query(None, alias="tag"),
+    poster_id: IdType | None = None,
+    poster: UsernameType | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: tuple[datetime, int] | None = Depends(parse_post_cursor),
+    session_factory: async_sessionmaker = Depends(get_read_session_factory)
+):
+    post_batches = post_service.export_posts(
+        tags,
+        poster_id=poster_id,
+        poster_username=poster,
+        since=since,
+        until=until,
+        cursor=cursor,
+        session_factory=session_factory
+    )
+    return StreamingResponse(ndjson_post_lines(post_batches), media_type="application/x-ndjson")
 
 
 @router.post(
     "/",
-    description="Creates a new post and returns the post's id",
+    description="Creates a new post and returns the post's id. Unknown tags are ignored unless create_tags is set",
     response_model=PostInfoModel,
-    status_code=201
+    status_code=201,
+    openapi_extra=POST_CREATION_OPENAPI
 )
 async def create_post(
+    create_tags: bool = False,
     post_data: PostCreationModel = Depends(sanitize_post_input_data),
     poster_id: int = Depends(verify_user_auth),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
 ):
     post_info = await post_service.add_post(
         tags=post_data.tags, 
         poster_id=poster_id, 
         title=post_data.title, 
         text=post_data.text, 
-        db=db
+        create_tags=create_tags,
+        db=db,
+        cache=cache
     )
 
     return post_info
 
 
+@router.post(
+    "/bulk/",
+    description="Imports posts from either a JSON array or an NDJSON (application/x-ndjson) request body \
+                and returns the import result of each post: either its id or the reason it was rejected. \
+                Unknown tags are ignored unless create_tags is set",
+    response_model=list[PostImportResultModel],
+    status_code=200,
+    # The body is parsed by hand to support NDJSON, so document it explicitly.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": TypeAdapter(list[PostImportModel]).json_schema()},
+                "application/x-ndjson": {"schema": {"type": "string"}}
+            }
+        }
+    }
+)
+async def import_posts(
+    create_tags: bool = False,
+    poster_id: int = Depends(verify_user_auth),
+    posts: list[PostImportModel | str] = Depends(parse_post_import_data),
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
+):
+    valid_posts = [post for post in posts if isinstance(post, PostImportModel)]
+    post_ids = iter(await post_service.import_posts(
+        valid_posts, 
+        poster_id=poster_id, 
+        create_tags=create_tags, 
+        db=db, 
+        cache=cache
+    ))
+    
+    return [
+        {"index": index, "id": next(post_ids)} if isinstance(post, PostImportModel) 
+        else {"index": index, "error": post}
+        for index, post in enumerate(posts)
+    ]
+
+
 @router.put(
     "/{post_id}",
-    description="Updates post by the given post id",
+    description="Updates post by the given post id. Unknown tags are ignored unless create_tags is set",
     response_model=PostModel,
-    status_code=200
+    status_code=200,
+    openapi_extra=POST_CREATION_OPENAPI
 )
 async def update_post(
+    create_tags: bool = False,
     post_data: PostCreationModel = Depends(sanitize_post_input_data),
     verified_post_id: int = Depends(verify_poster_authorship),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
 ):
     post = await post_service.modify_post(
         new_tags=post_data.tags,
         post_id=verified_post_id,
         new_title=post_data.title,
         new_text=post_data.text,
-        db=db
+        create_tags=create_tags,
+        db=db,
+        cache=cache
     )
     if post is None:
         # Should not happen, since verify_poster_authorship dependency ensures that the post exists,
@@ -112,9 +391,10 @@ async def update_post(
 )
 async def delete_post(
     db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis),
     post_id: int = Depends(verify_poster_authorship)
 ):
-    post = await post_service.remove_post(post_id, db)
+    post = await post_service.remove_post(post_id, db, cache)
     if post is None:
         # Should not happen, since verify_poster_authorship dependency ensures that the post exists,
         # but we'll check the return value of remove_post just in case.
@@ -125,16 +405,18 @@ async def delete_post(
 
 @router.get(
     "/tags/",
-    description="Returns all tags",
+    description="Returns all tags, most popular first, with the number of posts with the tag \
+                and when the tag was last added to a post",
     tags=["tag"],
-    response_model=list[TagModel],
+    response_model=list[TagStatsModel],
     status_code=200
 )
 async def get_tags(
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
     tags = await post_service.get_all_tags(db)
-    return tags
+    return fast_response(tags, response)
 
 
 @router.post(
@@ -148,10 +430,11 @@ async def get_tags(
     status_code=201
 )
 async def create_tag(
-    tag: str,
-    db: AsyncSession = Depends(get_db)
+    tag: TagNameType,
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
 ):
-    added_tag = await post_service.add_tag(tag, db)
+    added_tag = await post_service.add_tag(tag, db, cache)
     if added_tag is None:
         raise HTTPException(status_code=409, detail="Tag with such name already exists")
     return added_tag
@@ -169,9 +452,10 @@ async def create_tag(
 )
 async def delete_tag(
     tag: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cache: Redis = Depends(get_redis)
 ):
-    deleted_tag = await post_service.delete_tag(tag, db)
+    deleted_tag = await post_service.delete_tag(tag, db, cache)
     if deleted_tag is None:
         raise HTTPException(status_code=404, detail="Tag with such name does not exist")
     return deleted_tag
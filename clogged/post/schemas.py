@@ -1,12 +1,34 @@
-from typing import Annotated
+from typing import Annotated, Literal
 from datetime import datetime
-from annotated_types import Le, Lt
-from pydantic import BaseModel, NonNegativeInt
+from annotated_types import Le, Lt, MaxLen
+from clogged.auth.schemas import UsernameType
+from clogged.post.config import settings as post_settings
+from pydantic import BaseModel, NonNegativeInt, StringConstraints
 
 
 PostOffset = NonNegativeInt
 PostLimit = Annotated[NonNegativeInt, Le(100)]
 
+# Related data that may be embedded into posts on request.
+PostIncludeOption = Literal["poster"]
+
+# Names of created tags are restricted like usernames, since every worker keeps all tags in memory.
+TAG_NAME_PATTERN = r'^[a-zA-Z0-9\-_]+$'
+TagNameType = Annotated[
+    str,
+    StringConstraints(
+        strip_whitespace=True, 
+        min_length=1, 
+        max_length=post_settings.CLOGGED_TAG_MAX_LENGTH, 
+        pattern=TAG_NAME_PATTERN
+    )
+]
+# Posts may reference any existing tag, the names of tags they create are checked when creating them.
+PostTagsType = Annotated[list[str], MaxLen(post_settings.CLOGGED_POST_MAX_TAGS)]
+
+PostTitleType = Annotated[str, StringConstraints(max_length=post_settings.CLOGGED_POST_MAX_TITLE_LENGTH)]
+PostTextType = Annotated[str, StringConstraints(max_length=post_settings.CLOGGED_POST_MAX_TEXT_LENGTH)]
+
 
 class PostModel(BaseModel):
     id: NonNegativeInt
@@ -25,11 +47,43 @@ class PostInfoModel(BaseModel):
     tags: list[str]
 
 
+# Embedded author's username is None for removed posters and only present if requested with `include=poster`.
+class PostWithPosterModel(PostModel):
+    poster_username: UsernameType | None = None
+
+
+class PostInfoWithPosterModel(PostInfoModel):
+    poster_username: UsernameType | None = None
+
+
+class PostSearchResultModel(PostInfoModel):
+    rank: float
+
+
 class PostCreationModel(BaseModel):
-    title: str
-    tags: list[str]
-    text: str
+    title: PostTitleType
+    tags: PostTagsType
+    text: PostTextType
+
+
+class PostImportModel(PostCreationModel):
+    # Imported posts may keep their original creation time.
+    created_at: datetime | None = None
+
+
+class PostImportResultModel(BaseModel):
+    # Index of the post in the imported posts.
+    index: NonNegativeInt
+    id: NonNegativeInt | None = None
+    error: str | None = None
 
 
 class TagModel(BaseModel):
     tag: str
+
+
+class TagStatsModel(TagModel):
+    # Number of posts with the tag.
+    posts_n: NonNegativeInt
+    # When the tag was last added to a post, None if it never was.
+    last_used_at: datetime | None
@@ -1,13 +1,71 @@
 from typing import Any
-from collections.abc import Iterable
-from clogged.post.models import Post, PostTag, TaggedPost
-from clogged.post.utils import match_tag_strings, enrich_with_post_tags
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, insert, insert
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime, timezone
+from clogged.dependencies import is_replica_session
+from clogged.post.config import settings as post_settings
+from clogged.post.schemas import PostImportModel
+from clogged.post.cache import (
+    bump_feed_generation,
+    cache_feed_page,
+    cache_post, 
+    feed_cache_key,
+    get_cached_feed_page,
+    get_cached_post, 
+    get_feed_generation,
+    get_post_version,
+    invalidate_cached_posts
+)
+from clogged.post.models import SEARCH_TEXT_CONFIG, Post, PostTag, TaggedPost
+from clogged.post.registry import publish_tag_change, tag_registry
+from clogged.poster.models import Poster
+from clogged.poster.service import get_poster_usernames
+from clogged.post.utils import (
+    match_tag_strings, 
+    enrich_with_post_tags, 
+    post_tags_array, 
+    resolve_tags, 
+    update_tag_stats
+)
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from collections import Counter
+from sqlalchemy import REAL, Integer, bindparam, func, select, delete, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+
+async def get_post(
+    post_id: int, 
+    db: AsyncSession, 
+    cache: Redis, 
+    *, 
+    version: int | None = None
+) -> dict[str, Any] | None:
+    """
+    Returns the post by the given id or None if post does not exist, reading through the post cache.
+    The current post version is used unless the already known `version` is given.
+    """
+    # The version is read before the post, so a post read before a change is never cached as a newer version.
+    if version is None:
+        version = await get_post_version(post_id, cache)
+    post, _ = await get_versioned_post(post_id, version, db, cache)
+    return post
 
 
-async def get_post(post_id: int, db: AsyncSession) -> dict[str, Any] | None:
-    """Returns the post by the given id or None if post does not exist."""
+async def get_versioned_post(
+    post_id: int, 
+    version: int, 
+    db: AsyncSession, 
+    cache: Redis
+) -> tuple[dict[str, Any] | None, bool]:
+    """
+    Returns the post by the given id or None if post does not exist, reading through the given version 
+    of the cached post, and whether the post is known to be of at least that version.
+    Cache misses read from a replica may predate the version, since replicas lag behind the primary.
+    """
+    cached_post = await get_cached_post(post_id, version, cache)
+    if cached_post is not None:
+        return cached_post, True
+
     query = (
         select(Post)
         .where(Post.id == post_id)
@@ -15,7 +73,7 @@ async def get_post(post_id: int, db: AsyncSession) -> dict[str, Any] | None:
     query = await enrich_with_post_tags(query)
     result = (await db.execute(query)).first()
     if result is None:
-        return None
+        return None, not is_replica_session(db)
     
     post, tags = result
     post = {
@@ -27,44 +85,85 @@ async def get_post(post_id: int, db: AsyncSession) -> dict[str, Any] | None:
         "tags": tags
     }
 
-    return post
+    if is_replica_session(db):
+        return post, False
+    
+    await cache_post(post, version, cache)
+    return post, True
 
 
 async def get_latest_posts_info(
     tags: Iterable[str] | None = None,
     *,
+    poster_id: int | None = None,
+    poster_username: str | None = None,
     limit: int, 
-    offset: int,
-    db: AsyncSession
-) -> list[dict[str, Any]]:
+    offset: int = 0,
+    cursor: tuple[datetime, int] | None = None,
+    generation: int | None = None,
+    db: AsyncSession,
+    cache: Redis
+) -> tuple[list[dict[str, Any]], bool]:
     """
-    Returns a max of `limit` latest posts info containing at least one given tag if any given, 
-    offset by `offset` in the format of:
+    Returns a max of `limit` latest posts info containing at least one given tag if any given
+    and posted by the poster with the given `poster_id` and/or `poster_username` if any given,
+    starting right after the `(created_at, post_id)` `cursor` if given and offset by `offset` in the format of:
 
     `{'id': post_id, 'poster_id': poster_id, 'title': title, 'created_at': created_at, 'tags': [tag1, tag2, ...]}`
+
+    Pages are cached per feed generation, which is bumped by every post write.
+    The current feed generation is used unless the already known `generation` is given.
+    Also returns whether the page is known to be of at least that generation:
+    cache misses read from a replica may predate it, since replicas lag behind the primary.
     """
-    # Selecting post info with aggregated post tags.
+    if generation is None:
+        generation = await get_feed_generation(cache)
+    page_key = feed_cache_key(
+        generation, 
+        tags, 
+        poster_id=poster_id, 
+        poster_username=poster_username, 
+        limit=limit, 
+        offset=offset, 
+        cursor=cursor
+    )
+    cached_posts = await get_cached_feed_page(page_key, cache)
+    if cached_posts is not None:
+        return cached_posts, True
+
+    # Selecting post info with per-post tags subqueries instead of a grouped join, 
+    # so that only the page's rows are read and their tags looked up, walking the (created_at, id) index.
     query = select(
         Post.id, 
         Post.poster_id, 
         Post.title, 
-        Post.created_at 
+        Post.created_at,
+        post_tags_array()
     )
-    query = await enrich_with_post_tags(query)
 
     if tags is not None:
         tag_ids = (await match_tag_strings(tags, db)).keys()
-        query = query.where(TaggedPost.tag_id.in_(tag_ids))
+        query = query.where(Post.id.in_(select(TaggedPost.post_id).where(TaggedPost.tag_id.in_(tag_ids))))
+
+    # Filtering by poster is backed by the (poster_id, created_at, id) index.
+    if poster_id is not None:
+        query = query.where(Post.poster_id == poster_id)
+    if poster_username is not None:
+        poster_id_query = select(Poster.id).where(Poster.username == poster_username).scalar_subquery()
+        query = query.where(Post.poster_id == poster_id_query)
+
+    if cursor is not None:
+        # Keyset pagination: seek past the last seen post via the (created_at, id) index
+        # instead of scanning and discarding `offset` rows.
+        query = query.where(tuple_(Post.created_at, Post.id) < cursor)
     
     query = (
         query
-            .order_by(Post.created_at.desc())
+            .order_by(Post.created_at.desc(), Post.id.desc())
             .limit(limit)
             .offset(offset)
     )
 
-    print(query)
-
     result = await db.execute(query)
     
     posts = [
@@ -77,56 +176,285 @@ async def get_latest_posts_info(
         } 
         for post_id, poster_id, title, created_at, tags in result.all()
     ]
-    
+
+    if is_replica_session(db):
+        return posts, False
+
+    await cache_feed_page(page_key, posts, cache)
+    return posts, True
+
+
+async def embed_poster_usernames(posts: list[dict[str, Any]], db: AsyncSession) -> list[dict[str, Any]]:
+    """Adds `poster_username` of the author to each of the given posts, None for removed posters."""
+    usernames = await get_poster_usernames((post["poster_id"] for post in posts), db)
+    for post in posts:
+        post["poster_username"] = usernames.get(post["poster_id"])
     return posts
 
 
+async def search_posts(
+    text: str,
+    tags: Iterable[str] | None = None,
+    *,
+    limit: int,
+    cursor: tuple[float, int] | None = None,
+    db: AsyncSession
+) -> list[dict[str, Any]]:
+    """
+    Returns a max of `limit` posts info matching the `text` web search query and containing at least one given tag
+    if any given, ordered by relevance and starting right after the `(rank, post_id)` `cursor` if given, in the format of:
+
+    `{'id': post_id, 'poster_id': poster_id, 'title': title, 'created_at': created_at, 'tags': [...], 'rank': rank}`
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, text)
+    rank = func.ts_rank(Post.search_vector, ts_query, type_=REAL)
+
+    query = select(
+        Post.id,
+        Post.poster_id,
+        Post.title,
+        Post.created_at,
+        rank.label("rank"),
+        post_tags_array()
+    )
+    # Matching against the search vector is backed by its GIN index.
+    query = query.where(Post.search_vector.op("@@")(ts_query))
+
+    if tags is not None:
+        tag_ids = (await match_tag_strings(tags, db)).keys()
+        query = query.where(Post.id.in_(select(TaggedPost.post_id).where(TaggedPost.tag_id.in_(tag_ids))))
+
+    if cursor is not None:
+        query = query.where(tuple_(rank, Post.id) < cursor)
+
+    query = (
+        query
+            .order_by(rank.desc(), Post.id.desc())
+            .limit(limit)
+    )
+
+    result = await db.execute(query)
+
+    posts = [
+        {
+            "id": post_id,
+            "poster_id": poster_id,
+            "title": title,
+            "created_at": created_at,
+            "tags": tags,
+            "rank": rank
+        }
+        for post_id, poster_id, title, created_at, rank, tags in result.all()
+    ]
+
+    return posts
+
+
+async def export_posts(
+    tags: Iterable[str] | None = None,
+    *,
+    poster_id: int | None = None,
+    poster_username: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: tuple[datetime, int] | None = None,
+    session_factory: async_sessionmaker
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Yields batches of all posts containing at least one given tag if any given, posted by the poster with 
+    the given `poster_id` and/or `poster_username` if any given and created in the `[since, until)` range,
+    oldest first and starting right after the `(created_at, post_id)` `cursor` if given, in the format of:
+
+    `{'id': post_id, 'poster_id': poster_id, 'title': title, 'text': text, 'created_at': created_at, 'tags': [...]}`
+
+    Posts are read from a server-side cursor, so memory usage does not depend on the number of exported posts.
+    Uses its own session from the given `session_factory`, since it outlives the request's dependencies when streamed.
+    """
+    # Per-post tags subquery instead of a grouped join keeps rows flowing in the (created_at, id) index order.
+    query = select(
+        Post.id,
+        Post.poster_id,
+        Post.title,
+        Post.text,
+        Post.created_at,
+        post_tags_array()
+    )
+
+    async with session_factory() as db:
+        if tags is not None:
+            tag_ids = (await match_tag_strings(tags, db)).keys()
+            query = query.where(Post.id.in_(select(TaggedPost.post_id).where(TaggedPost.tag_id.in_(tag_ids))))
+
+        if poster_id is not None:
+            query = query.where(Post.poster_id == poster_id)
+        if poster_username is not None:
+            poster_id_query = select(Poster.id).where(Poster.username == poster_username).scalar_subquery()
+            query = query.where(Post.poster_id == poster_id_query)
+
+        if since is not None:
+            query = query.where(Post.created_at >= since)
+        if until is not None:
+            query = query.where(Post.created_at < until)
+        if cursor is not None:
+            query = query.where(tuple_(Post.created_at, Post.id) > cursor)
+
+        query = (
+            query
+                .order_by(Post.created_at, Post.id)
+                .execution_options(yield_per=post_settings.CLOGGED_POST_EXPORT_BATCH_SIZE)
+        )
+
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield [
+                {
+                    "id": post_id,
+                    "poster_id": poster_id,
+                    "title": title,
+                    "text": text,
+                    "created_at": created_at,
+                    "tags": tags
+                }
+                for post_id, poster_id, title, text, created_at, tags in rows
+            ]
+
+
 async def add_post(
     tags: Iterable[str] | None = None,
     *,
     poster_id: int,
     title: str,
     text: str,
+    create_tags: bool = False,
     db: AsyncSession,
+    cache: Redis
 ) -> dict[str, Any]:
     """
     Adds a new post and returns the added post info. Poster with the given `poster_id` is assumed to exist.
     
-    Invalid `tags` are ignored.
+    Invalid `tags` are ignored, unless `create_tags` is set, in which case they are created.
     """
-    post = Post(poster_id=poster_id, title=title, text=text)
-    db.add(post)
-
-    if tags is not None:
-        matched_tags = await match_tag_strings(tags, db)
-        tag_ids = list(matched_tags.keys())
-        tags = list(matched_tags.values())
-        # Have to commit the post first to get a valid id.
-        await db.commit()
-        db.add_all(TaggedPost(post_id=post.id, tag_id=tag_id) for tag_id in tag_ids)
-
+    matched_tags, created_tags = await resolve_tags(tags or [], db, create_missing=create_tags)
+    tag_ids = list(matched_tags.keys())
+    tags = list(matched_tags.values())
+
+    # Insert the post and its tags with a single statement in a single transaction:
+    # the tags are inserted by a data-modifying CTE, which reads the new post id from the post insert's RETURNING,
+    # and another one updates the tags' statistics.
+    new_post = (
+        insert(Post)
+        .values(poster_id=poster_id, title=title, text=text)
+        .returning(Post.id, Post.created_at)
+        .cte("new_post")
+    )
+    query = select(new_post.c.id, new_post.c.created_at)
+    if tag_ids:
+        tag_ids_param = bindparam("tag_ids", tag_ids, type_=ARRAY(Integer))
+        new_tagged_posts = (
+            insert(TaggedPost)
+            .from_select(["post_id", "tag_id"], select(new_post.c.id, func.unnest(tag_ids_param)))
+            .cte("new_tagged_posts")
+        )
+        used_tags = (
+            update(PostTag)
+            .where(PostTag.id == func.any(tag_ids_param))
+            .values(posts_n=PostTag.posts_n + 1, last_used_at=func.now())
+            .cte("used_tags")
+        )
+        query = query.add_cte(new_tagged_posts, used_tags)
+
+    post_id, created_at = (await db.execute(query)).one()
     await db.commit()
+    await bump_feed_generation(cache)
+    await register_created_tags(created_tags, cache)
 
     post_info = {
-        "id": post.id,
-        "poster_id": post.poster_id,
-        "title": post.title,
-        "created_at": post.created_at,
+        "id": post_id,
+        "poster_id": poster_id,
+        "title": title,
+        "created_at": created_at,
         "tags": tags
     }
 
     return post_info
 
 
+async def import_posts(
+    posts: list[PostImportModel],
+    *,
+    poster_id: int,
+    create_tags: bool = False,
+    db: AsyncSession,
+    cache: Redis
+) -> list[int]:
+    """
+    Adds the given posts in a single transaction and returns their ids in the same order.
+    Poster with the given `poster_id` is assumed to exist.
+
+    Tags are resolved once for all posts and posts along with their tags are inserted 
+    in batches of `CLOGGED_POST_IMPORT_BATCH_SIZE`. 
+    Invalid tags are ignored, unless `create_tags` is set, in which case they are created.
+    """
+    matched_tags, created_tags = await resolve_tags(
+        (tag for post in posts for tag in post.tags), 
+        db, 
+        create_missing=create_tags
+    )
+    tag_ids = {tag: tag_id for tag_id, tag in matched_tags.items()}
+    # Posts without the original creation time are all created now.
+    now = datetime.now(timezone.utc)
+
+    post_ids: list[int] = []
+    tag_posts_n_deltas: Counter[int] = Counter()
+    batch_size = post_settings.CLOGGED_POST_IMPORT_BATCH_SIZE
+    for batch_start in range(0, len(posts), batch_size):
+        batch = posts[batch_start:batch_start + batch_size]
+        post_rows = [
+            {
+                "poster_id": poster_id,
+                "title": post.title,
+                "text": post.text,
+                "created_at": post.created_at or now
+            }
+            for post in batch
+        ]
+        # Rendered as multi-row INSERT ... RETURNING statements, with ids returned in the rows order.
+        query = insert(Post).returning(Post.id, sort_by_parameter_order=True)
+        batch_post_ids = (await db.execute(query, post_rows)).scalars().all()
+
+        tagged_post_rows = [
+            {"post_id": post_id, "tag_id": tag_ids[tag]}
+            for post_id, post in zip(batch_post_ids, batch)
+            for tag in set(post.tags) if tag in tag_ids
+        ]
+        if tagged_post_rows:
+            await db.execute(insert(TaggedPost), tagged_post_rows)
+            tag_posts_n_deltas.update(row["tag_id"] for row in tagged_post_rows)
+
+        post_ids.extend(batch_post_ids)
+
+    await update_tag_stats(tag_posts_n_deltas, db)
+    await db.commit()
+    await bump_feed_generation(cache)
+    await register_created_tags(created_tags, cache)
+    return post_ids
+
+
 async def modify_post(
     new_tags: Iterable[str] | None = None,
     *,
     post_id: int,
     new_title: str,
     new_text: str,
-    db: AsyncSession
+    create_tags: bool = False,
+    db: AsyncSession,
+    cache: Redis
 ) -> dict[str, Any] | None:
-    """Updates the post with the given post id and returns the updated post info or None if post does not exist."""
+    """
+    Updates the post with the given post id and returns the updated post info or None if post does not exist.
+
+    Invalid `new_tags` are ignored, unless `create_tags` is set, in which case they are created.
+    """
     query = select(Post).where(Post.id == post_id)
     query = await enrich_with_post_tags(query)
     result = (await db.execute(query)).first()
@@ -137,74 +465,109 @@ async def modify_post(
     post.title = new_title
     post.text = new_text
 
+    created_tags = {}
     if new_tags is not None:
-        new_matched_tags = await match_tag_strings(new_tags, db)
-        new_tag_ids = set(new_matched_tags.keys())
-        new_tags = list(new_matched_tags.values())
+        new_matched_tags, created_tags = await resolve_tags(new_tags, db, create_missing=create_tags)
 
         # Computing set differences to find optimal way to add/remove tags.
-        current_tag_ids = set(tags)
-        tags_to_remove = current_tag_ids - new_tag_ids
-        tags_to_add = new_tag_ids - current_tag_ids
+        current_tags = set(tags)
+        tags_to_add = [tag_id for tag_id, tag in new_matched_tags.items() if tag not in current_tags]
+        tags = list(new_matched_tags.values())
 
-        if tags_to_remove: 
+        tag_posts_n_deltas = Counter(tags_to_add)
+        if current_tags - set(tags): 
             tag_remove_query = (
                 delete(TaggedPost)
                 .where(TaggedPost.post_id == post_id)
-                .where(TaggedPost.tag_id.in_(tags_to_remove))
+                .where(TaggedPost.tag_id.not_in(new_matched_tags.keys()))
+                .returning(TaggedPost.tag_id)
             )
-            await db.execute(tag_remove_query)
+            removed_tag_ids = (await db.execute(tag_remove_query)).scalars().all()
+            tag_posts_n_deltas.subtract(removed_tag_ids)
             
         if tags_to_add:
-            db.add_all(TaggedPost(post_id=post_id, tag_id=tag_id) for tag_id in new_tag_ids)
+            tag_add_query = insert(TaggedPost).values([
+                {"post_id": post_id, "tag_id": tag_id} for tag_id in tags_to_add
+            ])
+            await db.execute(tag_add_query)
+
+        await update_tag_stats(tag_posts_n_deltas, db)
 
     await db.commit()
+    await invalidate_cached_posts([post_id], cache)
+    await register_created_tags(created_tags, cache)
 
     post_info = {
         "id": post.id,
         "poster_id": post.poster_id,
         "title": post.title,
         "created_at": post.created_at,
-        "tags": new_tags,
+        "tags": tags,
         "text": post.text
     }
 
     return post_info
 
 
-async def remove_post(post_id: int, db: AsyncSession) -> dict[str, Any] | None:
+async def remove_post(post_id: int, db: AsyncSession, cache: Redis) -> dict[str, Any] | None:
     """Removes the post by the given post id and returns the removed post info or None if post does not exist."""
     query = select(Post).where(Post.id == post_id)
     query = await enrich_with_post_tags(query)
-    post = (await db.execute(query)).scalar()
-    if post is None:
+    result = (await db.execute(query)).first()
+    if result is None:
         return None
 
+    post, tags = result
     removed_post = {
         "id": post.id,
         "poster_id": post.poster_id,
         "title": post.title,
         "created_at": post.created_at,
-        "tags": post.tags
+        "tags": tags
     }
 
     await db.delete(post)
 
-    tag_query = delete(TaggedPost).where(TaggedPost.post_id == post_id)
-    await db.execute(tag_query)
+    tag_query = (
+        delete(TaggedPost)
+        .where(TaggedPost.post_id == post_id)
+        .returning(TaggedPost.tag_id)
+    )
+    removed_tag_ids = (await db.execute(tag_query)).scalars().all()
+    await update_tag_stats({tag_id: -1 for tag_id in removed_tag_ids}, db)
     await db.commit()
+    await invalidate_cached_posts([post_id], cache)
 
     return removed_post
 
 
-async def get_all_tags(db: AsyncSession) -> list[dict[str, str]]:
-    """Returns a list of all tags in the format of `{'tag': tag_name}`."""
-    query = select(PostTag.name)
+async def register_created_tags(created_tags: dict[int, str], cache: Redis):
+    """Adds the given committed tags (tag ids mapped to tag names) to the tag registries of all workers."""
+    if not created_tags:
+        return
+    
+    for tag_id, tag in created_tags.items():
+        tag_registry.add(tag_id, tag)
+    await publish_tag_change("add", created_tags, cache)
+
+
+async def get_all_tags(db: AsyncSession) -> list[dict[str, Any]]:
+    """
+    Returns a list of all tags, most popular first, with their statistics in the format of 
+    `{'tag': tag_name, 'posts_n': posts_n, 'last_used_at': last_used_at}`.
+    """
+    query = (
+        select(PostTag.name, PostTag.posts_n, PostTag.last_used_at)
+        .order_by(PostTag.posts_n.desc(), PostTag.name)
+    )
     result = await db.execute(query)
-    return [{"tag": tag} for tag, in result.all()]
+    return [
+        {"tag": tag, "posts_n": posts_n, "last_used_at": last_used_at} 
+        for tag, posts_n, last_used_at in result.all()
+    ]
 
 
-async def add_tag(tag: str, db: AsyncSession) -> dict[str, str] | None:
+async def add_tag(tag: str, db: AsyncSession, cache: Redis) -> dict[str, str] | None:
     """
     Creates a new `tag` and returns it in the format of `{'tag': tag_name}`.
     
@@ -213,15 +576,25 @@ async def add_tag(tag: str, db: AsyncSession) -> dict[str, str] | None:
     if (await match_tag_strings([tag], db)):
         return None
 
-    query = insert(PostTag).values(name=tag)
-    await db.execute(query)
+    query = (
+        insert(PostTag)
+        .values(name=tag)
+        # The tag may have been just created by another worker, which registry hasn't caught up yet.
+        .on_conflict_do_nothing(index_elements=[PostTag.name])
+        .returning(PostTag.id)
+    )
+    tag_id = (await db.execute(query)).scalar()
     await db.commit()
+    if tag_id is None:
+        return None
+
+    await register_created_tags({tag_id: tag}, cache)
 
     result = {"tag": tag}
     return result
 
 
-async def delete_tag(tag: str, db: AsyncSession) -> dict[str, str] | None:
+async def delete_tag(tag: str, db: AsyncSession, cache: Redis) -> dict[str, str] | None:
     """
     Deletes the `tag` and returns it in the format of `{'tag': tag_name}`.
     
@@ -233,11 +606,20 @@ async def delete_tag(tag: str, db: AsyncSession) -> dict[str, str] | None:
 
     tag_id = next(iter(tag_id))
 
-    query = delete(TaggedPost).where(TaggedPost.tag_id == tag_id)
-    await db.execute(query)
+    query = (
+        delete(TaggedPost)
+        .where(TaggedPost.tag_id == tag_id)
+        .returning(TaggedPost.post_id)
+    )
+    # Posts that lost the tag have to be evicted from the cache.
+    untagged_post_ids = (await db.execute(query)).scalars().all()
     query = delete(PostTag).where(PostTag.id == tag_id)
     await db.execute(query)
     await db.commit()
+    await invalidate_cached_posts(untagged_post_ids, cache)
+
+    tag_registry.remove(tag)
+    await publish_tag_change("delete", {tag_id: tag}, cache)
     
     result = {"tag": tag}
     return result
@@ -1,22 +1,339 @@
-from collections.abc import Iterable
+import json
+import re
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Callable, Iterable
+from typing import Any
+from datetime import datetime
+from clogged.compression import gzip_etag
+from clogged.concurrency import BoundedExecutor, ExecutorBusyError
+from clogged.metrics import POST_SANITIZATION_DURATION
+from clogged.post.config import settings as post_settings
 from clogged.post.models import Post, PostTag, TaggedPost
-from sqlalchemy import select, func
+from clogged.post.registry import tag_registry
+from clogged.post.schemas import TAG_NAME_PATTERN, PostCreationModel, PostImportModel
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy import TEXT, bindparam, case, select, func, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.sql.selectable import Select
 from sqlalchemy.ext.asyncio import AsyncSession
+import nh3
+
+# nh3 releases the GIL while sanitizing, so large posts are sanitized in threads to not stall the event loop.
+sanitization_executor = BoundedExecutor(
+    "post-sanitization",
+    max_workers=post_settings.CLOGGED_POST_SANITIZATION_MAX_CONCURRENCY,
+    queue_timeout=post_settings.CLOGGED_POST_SANITIZATION_QUEUE_TIMEOUT_SECONDS
+)
+
+# Bulk imports are parsed and sanitized in their own thread pool,
+# so that a few long imports can't hold every sanitization slot and starve single post writes.
+import_executor = BoundedExecutor(
+    "post-import",
+    max_workers=post_settings.CLOGGED_POST_IMPORT_MAX_CONCURRENCY,
+    queue_timeout=post_settings.CLOGGED_POST_IMPORT_QUEUE_TIMEOUT_SECONDS
+)
 
 
 async def match_tag_strings(tags: Iterable[str], db: AsyncSession) -> dict[int, str]:
     """Returns a dictionary of tag ids mapped to tag names by the given tag names."""
+    # Resolve tags in memory unless the worker's tag registry hasn't been loaded (e.g. outside of the app).
+    if tag_registry.is_loaded:
+        return tag_registry.match(tags)
+
     query = select(PostTag).where(PostTag.name.in_(tags))
     result = await db.execute(query)
     return {tag.id: tag.name for tag, in result}
 
 
+def is_valid_tag_name(tag: str) -> bool:
+    """Returns whether a tag with the given name may be created."""
+    return len(tag) <= post_settings.CLOGGED_TAG_MAX_LENGTH and re.fullmatch(TAG_NAME_PATTERN, tag) is not None
+
+
+async def resolve_tags(
+    tags: Iterable[str], 
+    db: AsyncSession, 
+    *, 
+    create_missing: bool = False
+) -> tuple[dict[int, str], dict[int, str]]:
+    """
+    Returns a dictionary of tag ids mapped to tag names by the given tag names 
+    and a dictionary of the tags created by this call in the same format.
+
+    Unknown tags are skipped, unless `create_missing` is set, in which case they are all created
+    by a single statement in the current transaction, up to `CLOGGED_TAG_MAX_CREATED_PER_REQUEST` of them
+    and only if all their names are valid.
+    The created tags have to be added to the tag registry after committing.
+    """
+    # Deduplicate while keeping the given order.
+    tags = list(dict.fromkeys(tags))
+    matched_tags = await match_tag_strings(tags, db)
+    missing_tags = set(tags) - set(matched_tags.values())
+    if not create_missing or not missing_tags:
+        return matched_tags, {}
+    invalid_tags = [tag for tag in missing_tags if not is_valid_tag_name(tag)]
+    if invalid_tags:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"Can't create tags with invalid names: {', '.join(sorted(invalid_tags)[:10])}. "
+                f"Tag names may only contain up to {post_settings.CLOGGED_TAG_MAX_LENGTH} latin letters, digits, '-' and '_'"
+            )
+        )
+    if len(missing_tags) > post_settings.CLOGGED_TAG_MAX_CREATED_PER_REQUEST:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Can't create more than {post_settings.CLOGGED_TAG_MAX_CREATED_PER_REQUEST} tags at once"
+        )
+
+    query = (
+        insert(PostTag)
+        .from_select(["name"], select(func.unnest(bindparam("names", list(missing_tags), type_=ARRAY(TEXT)))))
+        .on_conflict_do_nothing(index_elements=[PostTag.name])
+        .returning(PostTag.id, PostTag.name)
+    )
+    created_tags = {tag_id: tag for tag_id, tag in (await db.execute(query)).all()}
+    
+    # Tags concurrently created by other transactions are skipped by ON CONFLICT and have to be looked up.
+    concurrently_created_tags = missing_tags - set(created_tags.values())
+    if concurrently_created_tags:
+        query = select(PostTag.id, PostTag.name).where(PostTag.name.in_(concurrently_created_tags))
+        matched_tags |= {tag_id: tag for tag_id, tag in (await db.execute(query)).all()}
+
+    return matched_tags | created_tags, created_tags
+
+
+async def update_tag_stats(tag_posts_n_deltas: dict[int, int], db: AsyncSession):
+    """
+    Adds the given deltas (tag ids mapped to posts number changes) to the tags' post counters
+    with a single statement in the current transaction. Tags with positive deltas are marked as used now.
+    """
+    tag_posts_n_deltas = {tag_id: delta for tag_id, delta in tag_posts_n_deltas.items() if delta != 0}
+    if not tag_posts_n_deltas:
+        return
+
+    delta = case(tag_posts_n_deltas, value=PostTag.id)
+    query = (
+        update(PostTag)
+        .where(PostTag.id.in_(tag_posts_n_deltas.keys()))
+        .values(
+            posts_n=PostTag.posts_n + delta,
+            last_used_at=case((delta > 0, func.now()), else_=PostTag.last_used_at)
+        )
+    )
+    await db.execute(query)
+
+
+async def run_sanitization(func: Callable[..., Any], *args: Any) -> Any:
+    """Runs `func(*args)` in the sanitization thread pool, rejecting the request with 503 if it's busy."""
+    try:
+        return await sanitization_executor.run(func, *args)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Too many large posts are being processed, try again later",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def sanitize_html(html: str) -> str:
+    """Returns HTML-sanitized `html`, offloading large inputs to the sanitization thread pool."""
+    if len(html) < post_settings.CLOGGED_POST_SANITIZATION_OFFLOAD_THRESHOLD:
+        return nh3.clean(html)
+    
+    started_at = time.perf_counter()
+    sanitized_html = await run_sanitization(nh3.clean, html)
+    POST_SANITIZATION_DURATION.observe(time.perf_counter() - started_at)
+    return sanitized_html
+
+
+async def sanitize_post_data(post_data: PostCreationModel) -> PostCreationModel:
+    """Returns HTML-sanitized post data."""
+    post_data.text = await sanitize_html(post_data.text)
+    post_data.title = await sanitize_html(post_data.title)
+    return post_data
+
+
+def _validate_post_json(body: bytes) -> PostCreationModel:
+    try:
+        return PostCreationModel.model_validate_json(body)
+    except ValidationError as e:
+        # Reported the same way as request bodies validated by FastAPI itself.
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+
+
+async def parse_post_data(body: bytes) -> PostCreationModel:
+    """
+    Returns post data validated from the JSON `body` and HTML-sanitized.
+    Large bodies are validated in the sanitization thread pool to not stall the event loop.
+    """
+    if len(body) < post_settings.CLOGGED_POST_SANITIZATION_OFFLOAD_THRESHOLD:
+        post_data = _validate_post_json(body)
+    else:
+        post_data = await run_sanitization(_validate_post_json, body)
+
+    return await sanitize_post_data(post_data)
+
+
+def _validation_error_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'post'}: {error['msg']}" for error in e.errors())
+
+
+def _parse_post_import_item(raw_post: Any) -> PostImportModel | str:
+    """Returns the validated and HTML-sanitized post or its error message."""
+    try:
+        post_data = PostImportModel.model_validate(raw_post)
+    except ValidationError as e:
+        return _validation_error_message(e)
+
+    post_data.text = nh3.clean(post_data.text)
+    post_data.title = nh3.clean(post_data.title)
+    return post_data
+
+
+def _parse_posts_import_sync(body: bytes, ndjson: bool) -> list[PostImportModel | str]:
+    if ndjson:
+        lines = [line for line in body.splitlines() if line.strip()]
+        if len(lines) > post_settings.CLOGGED_POST_IMPORT_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413, 
+                detail=f"Can't import more than {post_settings.CLOGGED_POST_IMPORT_MAX_ITEMS} posts at once"
+            )
+
+        posts: list[PostImportModel | str] = []
+        for line in lines:
+            try:
+                raw_post = json.loads(line)
+            except ValueError:
+                # A malformed line only rejects its own post.
+                posts.append("post: Invalid JSON")
+                continue
+            posts.append(_parse_post_import_item(raw_post))
+        return posts
+
+    try:
+        raw_posts = json.loads(body)
+    except ValueError:
+        raw_posts = None
+    if not isinstance(raw_posts, list):
+        raise HTTPException(status_code=400, detail="Request body is neither a JSON array nor NDJSON")
+    if len(raw_posts) > post_settings.CLOGGED_POST_IMPORT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, 
+            detail=f"Can't import more than {post_settings.CLOGGED_POST_IMPORT_MAX_ITEMS} posts at once"
+        )
+
+    return [_parse_post_import_item(raw_post) for raw_post in raw_posts]
+
+
+async def parse_posts_import(body: bytes, *, ndjson: bool) -> list[PostImportModel | str]:
+    """
+    Returns posts parsed from either a JSON array or an NDJSON `body`, validated and HTML-sanitized 
+    the same way as single posts. Posts that could not be parsed are replaced by their error message.
+
+    Parsing, validation and sanitization of the whole body run in the import thread pool,
+    since they'd stall the event loop for large imports.
+    """
+    started_at = time.perf_counter()
+    try:
+        posts = await import_executor.run(_parse_posts_import_sync, body, ndjson)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Too many imports are being processed, try again later",
+            headers={"Retry-After": "5"}
+        )
+    
+    POST_SANITIZATION_DURATION.observe(time.perf_counter() - started_at)
+    return posts
+
+
+def matching_etag(if_none_match: str | None, etag: str) -> str | None:
+    """
+    Returns the ETag of the representation matched by the given `If-None-Match` header value, 
+    either the given strong `etag` or its gzip-coded variant, or None if neither matches.
+    """
+    if if_none_match is None:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    
+    # If-None-Match uses the weak comparison, so weak validators of the same entity tag match too.
+    etags = (etag, gzip_etag(etag))
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate in etags:
+            return candidate
+    return None
+
+
+def post_tags_array():
+    """
+    Returns a correlated subquery column of the post's tag names.
+    Unlike `enrich_with_post_tags()`, it needs no grouping, so that rows can be read in index order under a LIMIT.
+    """
+    post_tags = (
+        select(PostTag.name)
+        .join(TaggedPost, TaggedPost.tag_id == PostTag.id)
+        .where(TaggedPost.post_id == Post.id)
+        .scalar_subquery()
+    )
+    return func.array(post_tags, type_=ARRAY(TEXT)).label("tags")
+
+
 async def enrich_with_post_tags(query: Select) -> Select:
     """Enriches the given query with post tags."""
     return (query
-            .add_columns(func.array_agg(PostTag.name).label("tags"))
-            .join(TaggedPost, Post.id == TaggedPost.post_id)
-            .join(PostTag, TaggedPost.tag_id == PostTag.id)
+            # Outer joins keep posts without tags, which then have an empty tags array.
+            .add_columns(func.array_remove(func.array_agg(PostTag.name), None).label("tags"))
+            .outerjoin(TaggedPost, Post.id == TaggedPost.post_id)
+            .outerjoin(PostTag, TaggedPost.tag_id == PostTag.id)
             .group_by(Post.id)
     )
+
+
+def encode_cursor(*keys: str) -> str:
+    """Returns an opaque url-safe cursor encoding the given keyset pagination keys."""
+    raw = "|".join(keys)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    """Returns keyset pagination keys encoded in the given cursor. Raises ValueError if the cursor is malformed."""
+    # Restore the stripped base64 padding.
+    raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    return raw.split("|")
+
+
+def encode_post_cursor(created_at: datetime, post_id: int) -> str:
+    """Returns an opaque url-safe cursor pointing right after the post with the given `created_at` and `post_id`."""
+    return encode_cursor(created_at.isoformat(), str(post_id))
+
+
+def decode_post_cursor(cursor: str) -> tuple[datetime, int] | None:
+    """Returns the `(created_at, post_id)` pair encoded in the given cursor or None if the cursor is malformed."""
+    try:
+        created_at, post_id = decode_cursor(cursor)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except ValueError:
+        return None
+
+
+def encode_search_cursor(rank: float, post_id: int) -> str:
+    """Returns an opaque url-safe cursor pointing right after the search result with the given `rank` and `post_id`."""
+    # repr() round-trips floats exactly, so the cursor seeks exactly past the last result.
+    return encode_cursor(repr(rank), str(post_id))
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int] | None:
+    """Returns the `(rank, post_id)` pair encoded in the given cursor or None if the cursor is malformed."""
+    try:
+        rank, post_id = decode_cursor(cursor)
+        return float(rank), int(post_id)
+    except ValueError:
+        return None
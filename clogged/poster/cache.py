@@ -0,0 +1,76 @@
+from typing import Any
+from clogged.lru import LRUCache
+from clogged.poster.config import settings as poster_settings
+from clogged.poster.schemas import PosterModel
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+
+
+# Bumped on every poster change by the admin service, so that cached directory pages 
+# of older versions are never read again and simply expire.
+POSTER_DIRECTORY_VERSION_KEY = "posters:version"
+
+poster_directory_page_adapter = TypeAdapter(list[PosterModel])
+
+# Redis pub/sub channel used to evict changed posters from the usernames caches of all workers.
+POSTER_CHANGES_CHANNEL = "poster:changes"
+
+# Per-worker cache of poster ids mapped to usernames, used to embed authors into posts.
+poster_usernames = LRUCache(
+    maxsize=poster_settings.CLOGGED_POSTER_USERNAME_CACHE_SIZE,
+    ttl=poster_settings.CLOGGED_POSTER_USERNAME_CACHE_TTL_SECONDS
+)
+
+
+def evict_poster_username(poster_id: int | None = None):
+    """Removes the poster with the given id, or all posters if not given, from this worker's usernames cache."""
+    if poster_id is None:
+        poster_usernames.clear()
+    else:
+        poster_usernames.pop(poster_id)
+
+
+async def publish_poster_change(poster_id: int, cache: Redis):
+    """Evicts the poster with the given id from the usernames caches of all workers, including this one."""
+    evict_poster_username(poster_id)
+    await cache.publish(POSTER_CHANGES_CHANNEL, str(poster_id))
+
+
+async def apply_poster_change(message: str):
+    """Applies a poster change published by `publish_poster_change()`."""
+    evict_poster_username(int(message))
+
+
+async def reset_poster_usernames():
+    evict_poster_username()
+
+
+async def bump_poster_directory_version(cache: Redis):
+    """Invalidates all cached poster directory pages."""
+    await cache.incr(POSTER_DIRECTORY_VERSION_KEY)
+
+
+async def get_poster_directory_version(cache: Redis) -> int:
+    """Returns the current poster directory version."""
+    return int(await cache.get(POSTER_DIRECTORY_VERSION_KEY) or 0)
+
+
+def poster_directory_cache_key(version: int, *, prefix: str | None, limit: int, cursor: str | None) -> str:
+    """Returns the redis key of the poster directory page of the given version and page parameters."""
+    # Usernames never contain ':', so the key parts can't be confused with each other.
+    return f"posters:{version}:{prefix or ''}:{limit}:{cursor or ''}"
+
+
+async def get_cached_poster_directory_page(key: str, cache: Redis) -> list[dict[str, Any]] | None:
+    """Returns the cached poster directory page by the given key or None if it's not cached."""
+    serialized_page = await cache.get(key)
+    if serialized_page is None:
+        return None
+
+    return poster_directory_page_adapter.dump_python(poster_directory_page_adapter.validate_json(serialized_page))
+
+
+async def cache_poster_directory_page(key: str, posters: list[dict[str, Any]], cache: Redis):
+    """Caches the given poster directory page for `CLOGGED_POSTER_DIRECTORY_CACHE_TTL_SECONDS`."""
+    serialized_page = poster_directory_page_adapter.dump_json(poster_directory_page_adapter.validate_python(posters))
+    await cache.set(key, serialized_page, ex=poster_settings.CLOGGED_POSTER_DIRECTORY_CACHE_TTL_SECONDS)
@@ -0,0 +1,15 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class PosterConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Cached poster directory pages expire in 10 minutes, stale versions are never read anyway.
+    CLOGGED_POSTER_DIRECTORY_CACHE_TTL_SECONDS: int = 60*10
+    # Max number of poster usernames kept in memory per worker for embedding authors into posts.
+    CLOGGED_POSTER_USERNAME_CACHE_SIZE: int = 10000
+    # Changes are pushed to all workers, the TTL only bounds staleness if a change notification is missed.
+    CLOGGED_POSTER_USERNAME_CACHE_TTL_SECONDS: float = 60.0
+
+
+settings = PosterConfig()
@@ -0,0 +1,15 @@
+from clogged.post.utils import decode_cursor
+from fastapi import HTTPException
+
+
+async def parse_poster_cursor(cursor: str | None = None) -> str | None:
+    """Returns the username decoded from the opaque poster directory `cursor` query parameter if it's given."""
+    if cursor is None:
+        return None
+
+    try:
+        [username] = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return username
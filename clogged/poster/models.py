@@ -1,5 +1,5 @@
 from clogged.models import Base
-from sqlalchemy import Integer, TEXT, VARCHAR
+from sqlalchemy import Index, Integer, TEXT, VARCHAR
 from sqlalchemy.orm import Mapped, mapped_column
 
 
@@ -10,3 +10,7 @@ class Poster(Base):
     username: Mapped[str] = mapped_column(VARCHAR(16), unique=True)
     # A hashed and salted password using argon2. 
     credentials: Mapped[str] = mapped_column(TEXT)
+
+
+# The unique username index backs ordering by username, but prefix matches need a pattern operator class one.
+Index("ix_posters_username_pattern", Poster.username, postgresql_ops={"username": "varchar_pattern_ops"})
@@ -1,8 +1,13 @@
-from clogged.dependencies import get_db
+from clogged.dependencies import get_read_db
+from clogged.redis import get_redis
+from clogged.responses import fast_response
 from clogged.schemas import IdType
+from clogged.post.utils import encode_cursor
+from clogged.poster.dependencies import parse_poster_cursor
 from clogged.poster.service import get_poster, get_posters
-from clogged.poster.schemas import PosterModel
-from fastapi import APIRouter, Depends, HTTPException
+from clogged.poster.schemas import PosterLimit, PosterModel, UsernamePrefixType
+from fastapi import APIRouter, Depends, HTTPException, Response
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -14,13 +19,24 @@ router = APIRouter(
 
 @router.get(
     "/posters",
-    description="Returns all registered posters",
+    description="Returns registered posters ordered by username by the given cursor and limit, \
+                whose usernames start with the given prefix. \
+                The cursor for the next page is returned in the X-Next-Cursor header if there may be more posters",
     response_model=list[PosterModel],
     status_code=200
 )
-async def get_all_posters(db: AsyncSession = Depends(get_db)):
-    posters = await get_posters(db)
-    return posters
+async def get_all_posters(
+    response: Response,
+    prefix: UsernamePrefixType | None = None,
+    limit: PosterLimit = 100,
+    cursor: str | None = Depends(parse_poster_cursor),
+    db: AsyncSession = Depends(get_read_db),
+    cache: Redis = Depends(get_redis)
+):
+    posters = await get_posters(prefix, limit=limit, cursor=cursor, db=db, cache=cache)
+    if posters and len(posters) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(posters[-1]["username"])
+    return fast_response(posters, response)
 
 
 @router.get(
@@ -31,7 +47,7 @@ async def get_all_posters(db: AsyncSession = Depends(get_db)):
 )
 async def get_poster_info(
     poster_id: IdType,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     poster = await get_poster(poster_id, db)
     if poster is None:
@@ -1,5 +1,13 @@
+from typing import Annotated
+from annotated_types import Le
 from clogged.auth.schemas import UsernameType
-from pydantic import BaseModel, NonNegativeInt
+from pydantic import BaseModel, NonNegativeInt, StringConstraints
+
+
+PosterLimit = Annotated[NonNegativeInt, Le(1000)]
+
+# Same characters as usernames, so that a prefix can match any username.
+UsernamePrefixType = Annotated[str, StringConstraints(min_length=1, max_length=16, pattern=r'^[a-zA-Z0-9\-_]+$')]
 
 
 class PosterModel(BaseModel):
@@ -1,17 +1,84 @@
 from typing import Any
+from collections.abc import Iterable
+from clogged.dependencies import is_replica_session
+from clogged.poster.cache import (
+    cache_poster_directory_page,
+    get_cached_poster_directory_page,
+    get_poster_directory_version,
+    poster_directory_cache_key,
+    poster_usernames
+)
 from clogged.poster.models import Poster
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 
-async def get_posters(db: AsyncSession) -> list[dict[str, Any]]:
-    """Returns a list of posters in the format of: {'id': poster_id, 'username': username}."""
+async def get_posters(
+    prefix: str | None = None,
+    *,
+    limit: int,
+    cursor: str | None = None,
+    db: AsyncSession,
+    cache: Redis
+) -> list[dict[str, Any]]:
+    """
+    Returns a max of `limit` posters ordered by username, whose usernames start with `prefix` if given,
+    starting right after the `cursor` username if given, in the format of: {'id': poster_id, 'username': username}.
+
+    Pages are cached per poster directory version, which is bumped by every poster change.
+    """
+    version = await get_poster_directory_version(cache)
+    page_key = poster_directory_cache_key(version, prefix=prefix, limit=limit, cursor=cursor)
+    cached_posters = await get_cached_poster_directory_page(page_key, cache)
+    if cached_posters is not None:
+        return cached_posters
+
     query = select(Poster.id, Poster.username)
+    if prefix is not None:
+        # Backed by the username pattern index, autoescaping since '_' is allowed in usernames.
+        query = query.where(Poster.username.startswith(prefix, autoescape=True))
+    if cursor is not None:
+        # Keyset pagination over the unique username index.
+        query = query.where(Poster.username > cursor)
+    query = query.order_by(Poster.username).limit(limit)
+
     result = await db.execute(query)
     posters = [{"id": poster_id, "username": username} for poster_id, username in result.all()]
+
+    if not is_replica_session(db):
+        await cache_poster_directory_page(page_key, posters, cache)
     return posters
 
 
+async def get_poster_usernames(poster_ids: Iterable[int], db: AsyncSession) -> dict[int, str]:
+    """
+    Returns usernames mapped by the given poster ids, unknown posters are skipped.
+    Reads through the per-worker usernames cache, fetching all missing usernames with a single query.
+    """
+    usernames = {}
+    missing_poster_ids = set()
+    for poster_id in set(poster_ids):
+        username = poster_usernames.get(poster_id)
+        if username is None:
+            missing_poster_ids.add(poster_id)
+        else:
+            usernames[poster_id] = username
+
+    if missing_poster_ids:
+        # Usernames read before a poster change must not be cached after it.
+        generation = poster_usernames.generation
+        query = select(Poster.id, Poster.username).where(Poster.id.in_(missing_poster_ids))
+        result = await db.execute(query)
+        fill_cache = not is_replica_session(db)
+        for poster_id, username in result.all():
+            if fill_cache:
+                poster_usernames.set_if_unchanged(poster_id, username, generation)
+            usernames[poster_id] = username
+
+    return usernames
+
+
 async def get_poster(poster_id: int, db: AsyncSession) -> dict[str, Any] | None:
     """
     Returns poster in the format of: {'id': poster_id, 'username': username} 
@@ -0,0 +1,112 @@
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+from clogged.config import settings as app_settings
+from clogged.metrics import HTTP_REQUESTS_OVER_QUERY_BUDGET
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestQueryStats:
+    queries_n: int = 0
+
+
+# Set for the duration of each HTTP request by `QueryBudgetMiddleware`.
+request_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def _parameters_shape(parameters: Any, executemany: bool) -> str:
+    """Returns types of the statement's parameters, so that their values (e.g. password hashes) are never logged."""
+    if executemany:
+        if not parameters:
+            return "[]"
+        return f"{len(parameters)} x {_parameters_shape(parameters[0], False)}"
+
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+def _explain_analyze(conn, statement: str, parameters: Any) -> str:
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN ANALYZE {statement}", parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def profile_engine(engine: Engine, engine_name: str):
+    """
+    Counts statements executed by the given (sync) engine towards the current request's query budget
+    and logs statements slower than `CLOGGED_SLOW_QUERY_THRESHOLD_MS`.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_profiling(conn, cursor, statement, parameters, context, executemany):
+        stats = request_query_stats.get()
+        if stats is not None:
+            stats.queries_n += 1
+        conn.info.setdefault("profiling_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["profiling_started_at"].pop()) * 1000
+        if duration_ms < app_settings.CLOGGED_SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        logger.warning(
+            "Slow query on %s engine took %.2f ms, parameters %s:\n%s",
+            engine_name, duration_ms, _parameters_shape(parameters, executemany), statement
+        )
+
+        # EXPLAIN ANALYZE executes the statement once more, so only plain selects are safe to explain.
+        if (
+            app_settings.CLOGGED_IS_DEVELOPMENT
+            and app_settings.CLOGGED_EXPLAIN_SLOW_QUERIES
+            and not executemany
+            and statement.lstrip()[:6].upper() == "SELECT"
+        ):
+            try:
+                logger.warning("Query plan:\n%s", _explain_analyze(conn, statement, parameters))
+            except Exception:
+                logger.exception("Failed to explain slow query")
+
+    @event.listens_for(engine, "handle_error")
+    def discard_query_profiling(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profiling_started_at"):
+            conn.info["profiling_started_at"].pop()
+
+
+class QueryBudgetMiddleware:
+    """Flags HTTP requests executing more statements than `CLOGGED_REQUEST_QUERY_BUDGET`, e.g. due to N+1 queries."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = request_query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_query_stats.reset(token)
+            if stats.queries_n > app_settings.CLOGGED_REQUEST_QUERY_BUDGET:
+                route = scope.get("route")
+                route_path = route.path if route is not None else "<unmatched>"
+                HTTP_REQUESTS_OVER_QUERY_BUDGET.inc(method=scope["method"], route=route_path)
+                logger.warning(
+                    "%s %s executed %d queries, over the budget of %d",
+                    scope["method"], route_path, stats.queries_n, app_settings.CLOGGED_REQUEST_QUERY_BUDGET
+                )
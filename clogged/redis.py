@@ -1,12 +1,142 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
 from clogged.config import settings as app_settings
-from redis.asyncio import Redis
+from clogged.metrics import REDIS_COMMAND_DURATION, REDIS_POOL_CHECKOUT_WAIT
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
 
 
-async def get_redis() -> Redis:
-    # TODO: Consider adding pooled connection and maybe reuse the same connection (?)
-    # like with sqlalchemy's async sesion maker.
-    return await Redis.from_url(
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str], Awaitable[None]]
+ResyncHandler = Callable[[], Awaitable[None]]
+
+class InstrumentedBlockingConnectionPool(BlockingConnectionPool):
+    """Connection pool recording connection checkout wait times."""
+    async def get_connection(self, *args: Any, **kwargs: Any):
+        started_at = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            REDIS_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline recording latency of the whole pipeline execution."""
+    async def execute(self, *args: Any, **kwargs: Any):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute(*args, **kwargs)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started_at, command="PIPELINE")
+
+
+class InstrumentedRedis(Redis):
+    """Redis client recording latency of every command."""
+    async def execute_command(self, *args: Any, **options: Any):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started_at, command=str(args[0]).upper())
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# Per-worker connection pool, managed by `init_redis()` and `close_redis()` in the app lifespan.
+redis_pool: BlockingConnectionPool | None = None
+
+# Any message published to this channel makes every worker rebuild all of its in-process state,
+# e.g. after the app's database and redis were reset from outside of the app.
+RESYNC_CHANNEL = "app:resync"
+
+# Per-worker invalidation channel subscriptions, see `subscribe_to_invalidations()`.
+_message_handlers: dict[str, MessageHandler] = {}
+_resync_handlers: list[ResyncHandler] = []
+
+
+async def init_redis():
+    """Creates the worker's redis connection pool."""
+    global redis_pool
+    redis_pool = InstrumentedBlockingConnectionPool.from_url(
         app_settings.REDIS_DSN.unicode_string(),
         encoding="utf-8",
-        decode_responses=True
+        decode_responses=True,
+        max_connections=app_settings.CLOGGED_REDIS_MAX_CONNECTIONS,
+        timeout=app_settings.CLOGGED_REDIS_POOL_TIMEOUT_SECONDS,
+        socket_timeout=app_settings.CLOGGED_REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=app_settings.CLOGGED_REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+        health_check_interval=app_settings.CLOGGED_REDIS_HEALTH_CHECK_INTERVAL_SECONDS
     )
+
+
+async def close_redis():
+    """Closes all connections of the worker's redis connection pool."""
+    global redis_pool
+    if redis_pool is not None:
+        await redis_pool.disconnect()
+        redis_pool = None
+
+
+async def get_redis() -> Redis:
+    """Returns a redis client backed by the worker's shared connection pool."""
+    if redis_pool is None:
+        raise RuntimeError("Redis connection pool is not initialized")
+    
+    return InstrumentedRedis(connection_pool=redis_pool)
+
+
+def subscribe_to_invalidations(channel: str, on_message: MessageHandler, on_resync: ResyncHandler):
+    """
+    Registers `on_message` to be called with every message published to `channel` 
+    by `listen_for_invalidations()`.
+
+    `on_resync` is called every time the listener (re)subscribes, since messages published
+    while it was disconnected are lost and in-process state has to be rebuilt from scratch.
+    """
+    _message_handlers[channel] = on_message
+    add_resync_handler(on_resync)
+
+
+def add_resync_handler(on_resync: ResyncHandler):
+    """
+    Registers `on_resync` to be called every time the invalidation listener (re)subscribes 
+    or a message is published to `RESYNC_CHANNEL`, for in-process state not kept in sync by its own channel.
+    """
+    _resync_handlers.append(on_resync)
+
+
+async def publish_resync(redis_client: Redis):
+    """Makes all running workers rebuild their in-process state, see `add_resync_handler()`."""
+    await redis_client.publish(RESYNC_CHANNEL, "")
+
+
+async def _resync():
+    for on_resync in _resync_handlers:
+        await on_resync()
+
+
+async def listen_for_invalidations(redis_client: Redis):
+    """Dispatches messages of the subscribed invalidation channels to their handlers until cancelled."""
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(RESYNC_CHANNEL, *_message_handlers)
+                await _resync()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["channel"] == RESYNC_CHANNEL:
+                        await _resync()
+                    else:
+                        await _message_handlers[message["channel"]](message["data"])
+        except Exception:
+            # Keep listening no matter what, a dead listener would silently leave in-process state stale.
+            logger.exception("Invalidation channels listener failed, resubscribing")
+            await asyncio.sleep(1)
@@ -0,0 +1,30 @@
+from typing import Any
+from clogged.config import settings as app_settings
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered as is by pydantic-core's Rust serializer, which is a lot faster than the stdlib one."""
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def fast_response(content: Any, response: Response) -> Any:
+    """
+    Returns `content` wrapped into a `FastJSONResponse` if fast responses are enabled, otherwise returns it as is.
+    Headers already set on the route's `response` are kept.
+
+    Returning a response directly skips the route's response model validation and serialization,
+    so it's only meant for content built by the service layer, which already matches the response model. 
+    The response model is still used for the OpenAPI schema.
+    """
+    if not app_settings.CLOGGED_ENABLE_FAST_RESPONSES:
+        return content
+
+    fast_json_response = FastJSONResponse(content, status_code=response.status_code or 200)
+    fast_json_response.raw_headers.extend(
+        (name, value) for name, value in response.raw_headers if name != b"content-length"
+    )
+    return fast_json_response
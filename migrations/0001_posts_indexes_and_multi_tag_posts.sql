@@ -0,0 +1,28 @@
+-- Upgrades databases created before keyset pagination, full-text search, tag filtering by index,
+-- per-poster feeds and the poster directory. Tables created by the app since then already match it.
+-- Every statement is idempotent, run with `psql -f` outside of a transaction, since indexes are built concurrently.
+-- A failed concurrent build leaves an invalid index behind, drop it before running the file again.
+
+-- Tagged posts used to have per-column UNIQUE constraints, so a post could have only one tag
+-- and a tag could be added to only one post. The composite primary key is the intended constraint.
+ALTER TABLE tagged_posts DROP CONSTRAINT IF EXISTS tagged_posts_post_id_key;
+ALTER TABLE tagged_posts DROP CONSTRAINT IF EXISTS tagged_posts_tag_id_key;
+-- The primary key index only backs lookups by post_id.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tagged_posts_tag_id ON tagged_posts (tag_id);
+
+-- Keyset pagination of the latest posts feed and of a single poster's feed.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_created_at_id ON posts (created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_poster_id_created_at_id ON posts (poster_id, created_at DESC, id DESC);
+
+-- Prefix filtering of the poster directory.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posters_username_pattern ON posters (username varchar_pattern_ops);
+
+-- Full-text search. Adding a stored generated column rewrites the posts table under an exclusive lock,
+-- so schedule it along with a maintenance window on large databases.
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', text), 'B')
+    ) STORED NOT NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector);
+
+ANALYZE posts, posters, tagged_posts;
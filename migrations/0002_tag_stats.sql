@@ -0,0 +1,23 @@
+-- Upgrades databases created before per-tag statistics were maintained by post writes.
+-- Every statement is idempotent, run with `psql -f`.
+
+BEGIN;
+
+ALTER TABLE post_tags ADD COLUMN IF NOT EXISTS posts_n INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE post_tags ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP WITH TIME ZONE;
+
+-- Backfill the statistics from existing tagged posts, the newest tagged post approximating the last use.
+-- Locks tagged posts against concurrent writes, so that no counter changes are lost.
+LOCK TABLE tagged_posts IN SHARE MODE;
+UPDATE post_tags
+SET posts_n = coalesce(tag_stats.posts_n, 0), last_used_at = tag_stats.last_used_at
+FROM post_tags AS all_tags
+LEFT JOIN (
+    SELECT tagged_posts.tag_id, count(*) AS posts_n, max(posts.created_at) AS last_used_at
+    FROM tagged_posts
+    JOIN posts ON posts.id = tagged_posts.post_id
+    GROUP BY tagged_posts.tag_id
+) AS tag_stats ON tag_stats.tag_id = all_tags.id
+WHERE post_tags.id = all_tags.id;
+
+COMMIT;